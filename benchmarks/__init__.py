@@ -0,0 +1,95 @@
+"""Benchmarks for Yatube.
+
+Every module of the package is runnable from the project root with
+``python -m benchmarks.<module>`` and works on a throwaway test
+database, so the development database is never touched.
+"""
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+def setup() -> None:
+    """Configure Django for a standalone benchmark run."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(name: Optional[str] = None):
+    """Create a test database for the duration of the block.
+
+    SQLite test databases are kept in memory unless a file name is
+    given.
+    """
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+
+    # As the test runner does, so debug-only code is not measured.
+    setup_test_environment(debug=False)
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func: Callable, repeat: int = 20,
+            clear_cache: bool = True) -> Dict[str, float]:
+    """Call func repeat times and return its latency percentiles
+    in milliseconds, the number of queries and the peak memory
+    allocated by a single call.
+    """
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies = []
+    for _idx in range(repeat):
+        if clear_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    if clear_cache:
+        cache.clear()
+    return {
+        'queries': len(queries),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'peak_memory_kib': round(peak_memory(func) / 1024, 1),
+    }
+
+
+def peak_memory(func: Callable) -> int:
+    """Return the peak size in bytes of memory allocated by a call.
+
+    Tracing slows Python down, so it is measured in a separate call.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(values, percent: float) -> float:
+    """Return a percentile of sorted values (nearest-rank method)."""
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[rank - 1]
@@ -0,0 +1,154 @@
+"""Read-heavy views served through WSGI and ASGI at high concurrency.
+
+Every view is requested ``--requests`` times by ``--concurrency``
+clients at once: threads calling the WSGI application, the way
+a threaded WSGI server does, or coroutines calling the ASGI one.
+
+Usage: python -m benchmarks.asgi [--concurrency 32] [--requests 500]
+       [--posts 5000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks import percentile, setup, test_database
+
+SEED = 0
+
+
+def populate(posts: int) -> None:
+    from posts.dataset import DatasetGenerator
+
+    DatasetGenerator(
+        users=max(100, posts // 50), groups=20, posts=posts,
+        comments=posts, follows=20, seed=SEED,
+    ).generate()
+
+
+def paths():
+    from django.urls import reverse
+
+    from posts.models import Group, Post, UserStats
+
+    author = UserStats.objects.order_by('-posts_count').first().user
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.filter(author=author).order_by(
+        '-comments_count',
+    ).first()
+    return (
+        ('index', reverse('posts:index')),
+        ('group_posts', reverse('posts:group', kwargs={'slug': group.slug})),
+        ('profile', reverse('posts:profile', args=[author.username])),
+        ('post_view', reverse('posts:post', kwargs={
+            'username': author.username, 'post_id': post.pk,
+        })),
+    )
+
+
+def wsgi_environ(path: str) -> dict:
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def run_wsgi(path: str, concurrency: int, requests: int) -> list:
+    from yatube.wsgi import application
+
+    def request(_idx):
+        started = time.perf_counter()
+        response = application(wsgi_environ(path), lambda *args: None)
+        try:
+            for _chunk in response:
+                pass
+        finally:
+            response.close()
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(request, range(requests)))
+
+
+def run_asgi(path: str, concurrency: int, requests: int) -> list:
+    from yatube.asgi import application
+
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'path': path,
+        'query_string': b'',
+        'headers': [(b'host', b'testserver')],
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        pass
+
+    async def request(semaphore):
+        async with semaphore:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - started
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(
+            *(request(semaphore) for _idx in range(requests))
+        )
+
+    return asyncio.run(main())
+
+
+def run(concurrency: int, requests: int) -> None:
+    from django.core.cache import cache
+
+    print(f'{"view":>12} {"server":>6} {"req/s":>8} '
+          f'{"p50, ms":>9} {"p95, ms":>9}')
+    for view, path in paths():
+        for server, serve in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+            cache.clear()
+            started = time.perf_counter()
+            latencies = serve(path, concurrency, requests)
+            elapsed = time.perf_counter() - started
+            latencies = sorted(value * 1000 for value in latencies)
+            print(f'{view:>12} {server:>6} {requests / elapsed:>8.1f} '
+                  f'{statistics.median(latencies):>9.2f} '
+                  f'{percentile(latencies, 95):>9.2f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup()
+    # Threads need a database file, in-memory ones are per connection.
+    with tempfile.TemporaryDirectory() as directory, \
+            test_database(os.path.join(directory, 'benchmark.sqlite3')):
+        populate(args.posts)
+        run(args.concurrency, args.requests)
+
+
+if __name__ == '__main__':
+    main()
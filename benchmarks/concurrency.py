@@ -0,0 +1,174 @@
+"""Throughput of concurrent reads and writes with two database setups.
+
+Worker threads request feed pages and add comments through the test
+client for a fixed time, on a database file shared by all of them.
+The run is made with Django's default SQLite setup and with the one
+from the settings: WAL journal, tuned pragmas, immediate write
+transactions and persistent connections.
+
+Usage: python -m benchmarks.concurrency [--threads 8] [--duration 10]
+       [--write-share 0.1]
+"""
+import argparse
+import copy
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks import percentile, setup, test_database
+
+POSTS = 2000
+SEED = 0
+# Django defaults: rollback journal, full sync, deferred transactions,
+# a new connection for every request.
+DEFAULT_SETUP = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {
+        'timeout': 5,
+        'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    },
+}
+
+
+def populate() -> None:
+    from posts.dataset import DatasetGenerator
+
+    DatasetGenerator(
+        users=100, groups=10, posts=POSTS, comments=POSTS, follows=10,
+        seed=SEED,
+    ).generate()
+
+
+def urls():
+    """Return URLs of feed pages to read and of posts to comment on."""
+    from django.urls import reverse
+
+    from posts.models import Group, Post, User
+
+    reads = [reverse('posts:index')]
+    reads += [
+        reverse('posts:group', kwargs={'slug': slug})
+        for slug in Group.objects.values_list('slug', flat=True)
+    ]
+    reads += [
+        reverse('posts:profile', args=[username])
+        for username in User.objects.values_list('username', flat=True)[:20]
+    ]
+    writes = [
+        reverse('posts:add_comment', kwargs={
+            'username': post.author.username, 'post_id': post.pk,
+        })
+        for post in Post.objects.select_related('author')[:100]
+    ]
+    return reads, writes
+
+
+def configure(database: dict) -> None:
+    """Make new connections use a database setup."""
+    from django.db import connection
+
+    connection.close()
+    for key in ('CONN_MAX_AGE', 'OPTIONS'):
+        connection.settings_dict[key] = copy.deepcopy(database[key])
+    # The journal mode is kept in the file, switch it before workers
+    # connect.
+    connection.ensure_connection()
+    connection.close()
+
+
+def worker(seed: int, deadline: float, write_share: float,
+           reads, writes, results: dict, lock: threading.Lock) -> None:
+    from django.db import connection
+    from django.test import Client
+
+    from posts.models import User
+
+    generator = random.Random(seed)
+    client = Client(raise_request_exception=False)
+    client.force_login(User.objects.order_by('?').first())
+    latencies = {'read': [], 'write': []}
+    errors = 0
+    try:
+        while time.perf_counter() < deadline:
+            kind = 'write' if generator.random() < write_share else 'read'
+            started = time.perf_counter()
+            if kind == 'write':
+                response = client.post(
+                    generator.choice(writes), {'text': 'Комментарий.'},
+                )
+            else:
+                response = client.get(generator.choice(reads))
+            if response.status_code >= 500:
+                errors += 1
+            else:
+                latencies[kind].append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    with lock:
+        for kind, values in latencies.items():
+            results[kind] += values
+        results['errors'] += errors
+
+
+def run(name: str, database: dict, threads: int, duration: float,
+        write_share: float, reads, writes) -> None:
+    configure(database)
+    results = {'read': [], 'write': [], 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    workers = [
+        threading.Thread(target=worker, args=(
+            SEED + index, deadline, write_share, reads, writes,
+            results, lock,
+        ))
+        for index in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    for kind in ('read', 'write'):
+        latencies = sorted(ms * 1000 for ms in results[kind])
+        p50 = statistics.median(latencies) if latencies else 0
+        p95 = percentile(latencies, 95) if latencies else 0
+        print(f'{name:>8} {kind:>6} {len(latencies) / duration:>9.1f} '
+              f'{p50:>9.2f} {p95:>9.2f}')
+    print(f'{name:>8} {"errors":>6} {results["errors"]:>9}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument(
+        '--duration', type=float, default=10,
+        help='seconds to run every setup for',
+    )
+    parser.add_argument(
+        '--write-share', type=float, default=0.1,
+        help='share of requests adding a comment',
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+
+    tuned = settings.DATABASES['default']
+    with tempfile.TemporaryDirectory() as directory, \
+            test_database(os.path.join(directory, 'benchmark.sqlite3')):
+        tuned = copy.deepcopy(tuned)
+        populate()
+        reads, writes = urls()
+        print(f'{"setup":>8} {"kind":>6} {"per sec":>9} '
+              f'{"p50, ms":>9} {"p95, ms":>9}')
+        for name, database in (('default', DEFAULT_SETUP),
+                               ('tuned', tuned)):
+            run(name, database, args.threads, args.duration,
+                args.write_share, reads, writes)
+
+
+if __name__ == '__main__':
+    main()
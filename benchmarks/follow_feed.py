@@ -0,0 +1,91 @@
+"""Follow feed scaling with the number of followed authors.
+
+Compares the old way of building the feed, which loads every followed
+author into a Python set, and a single ``author IN (subquery)`` query
+with the per-author UNION ALL query used by ``follow_index``.
+
+Usage: python -m benchmarks.follow_feed [--authors 1 10 100 1000]
+"""
+import argparse
+
+from benchmarks import measure, setup, test_database
+
+
+def populate(reader, authors_count: int) -> None:
+    from posts.counters import (rebuild_follows_counters,
+                                rebuild_posts_counters)
+    from posts.models import Follow, Post, User
+
+    prefix = f'author_{authors_count}_'
+    User.objects.bulk_create(
+        User(username=f'{prefix}{idx}') for idx in range(authors_count)
+    )
+    authors = User.objects.filter(username__startswith=prefix)
+    Post.objects.bulk_create(
+        Post(author=author, text=f'Запись {author.username}.')
+        for author in authors
+    )
+    Follow.objects.filter(user=reader).delete()
+    Follow.objects.bulk_create(
+        Follow(user=reader, author=author) for author in authors
+    )
+    rebuild_posts_counters()
+    rebuild_follows_counters()
+
+
+def run(authors_counts, repeat: int) -> None:
+    from django.test import Client
+
+    from posts.follows import FollowedFeed
+    from posts.models import Post, User
+    from yatube.settings import POSTS_PER_PAGE
+
+    reader = User.objects.create_user(username='reader')
+    client = Client()
+    client.force_login(reader)
+
+    def legacy_feed():
+        authors = {follow.author for follow in reader.follower.all()}
+        list(Post.objects.filter(author__in=authors)[:POSTS_PER_PAGE])
+
+    def subquery_feed():
+        list(Post.objects.followed_by(reader)[:POSTS_PER_PAGE])
+
+    def merged_feed():
+        FollowedFeed(reader)[0:POSTS_PER_PAGE]
+
+    def view():
+        client.get('/follow/')
+
+    print(f'{"authors":>8} {"case":>9} {"queries":>8} '
+          f'{"p50, ms":>9} {"p95, ms":>9}')
+    for authors_count in authors_counts:
+        populate(reader, authors_count)
+        cases = (
+            ('legacy', legacy_feed),
+            ('subquery', subquery_feed),
+            ('merged', merged_feed),
+            ('view', view),
+        )
+        for name, func in cases:
+            result = measure(func, repeat=repeat)
+            print(f'{authors_count:>8} {name:>9} {result["queries"]:>8} '
+                  f'{result["p50_ms"]:>9} {result["p95_ms"]:>9}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--authors', type=int, nargs='+', default=[1, 10, 100, 1000],
+        help='numbers of followed authors to measure',
+    )
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.authors, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
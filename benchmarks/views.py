@@ -0,0 +1,200 @@
+"""Latency, queries and memory of the main views on growing datasets.
+
+For every dataset size a seeded dataset is generated from scratch and
+every view is requested through the test client. Feeds are measured
+with a cold cache and with their fragments cached. Results are saved
+as JSON, so runs made on different commits can be compared with
+``--baseline``.
+
+Usage: python -m benchmarks.views [--posts 1000 10000 100000]
+       [--repeat 20] [--output results.json] [--baseline old.json]
+"""
+import argparse
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+from benchmarks import measure, setup, test_database
+
+COMMENTS_PER_POST = 1
+POSTS_PER_USER = 50
+MIN_USERS = 100
+GROUPS = 20
+FOLLOWS = 20
+SEED = 0
+COMPARED_METRICS = ('queries', 'p50_ms', 'p95_ms', 'peak_memory_kib')
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def populate(posts: int) -> dict:
+    """Fill the database with a dataset of the size."""
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    from posts.dataset import DatasetGenerator
+
+    call_command('flush', interactive=False, verbosity=0)
+    cache.clear()
+    dataset = {
+        'users': max(MIN_USERS, posts // POSTS_PER_USER),
+        'groups': GROUPS,
+        'posts': posts,
+        'comments': posts * COMMENTS_PER_POST,
+        'follows': FOLLOWS,
+    }
+    DatasetGenerator(seed=SEED, **dataset).generate()
+    return dataset
+
+
+def cases():
+    """Return (view, measured callable, cacheable) of every view.
+
+    Requests are made by the user following the most authors, pages
+    show the most active author, the largest group and the most
+    commented post of that author.
+    """
+    from django.test import Client
+    from django.urls import reverse
+
+    from posts.models import Group, Post, UserStats
+
+    reader = UserStats.objects.order_by('-following_count').first().user
+    author = UserStats.objects.order_by('-posts_count').first().user
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.filter(author=author).order_by(
+        '-comments_count',
+    ).first()
+    post_kwargs = {'username': author.username, 'post_id': post.pk}
+
+    client = Client()
+    client.force_login(reader)
+
+    def get(url):
+        return lambda: client.get(url)
+
+    def add_comment():
+        client.post(
+            reverse('posts:add_comment', kwargs=post_kwargs),
+            {'text': 'Комментарий.'},
+        )
+
+    return (
+        ('index', get(reverse('posts:index')), True),
+        ('group_posts',
+         get(reverse('posts:group', kwargs={'slug': group.slug})), True),
+        ('profile',
+         get(reverse('posts:profile', args=[author.username])), False),
+        ('post_view', get(reverse('posts:post', kwargs=post_kwargs)), False),
+        ('follow_index', get(reverse('posts:follow_index')), True),
+        ('add_comment', add_comment, False),
+    )
+
+
+def run(sizes, repeat: int) -> list:
+    results = []
+    print(f'{"posts":>8} {"view":>13} {"cache":>5} {"queries":>8} '
+          f'{"p50, ms":>9} {"p95, ms":>9} {"p99, ms":>9} {"peak, KiB":>10}')
+    for size in sizes:
+        dataset = populate(size)
+        for view, func, cacheable in cases():
+            modes = ('cold', 'warm') if cacheable else ('cold',)
+            for mode in modes:
+                if mode == 'warm':
+                    func()
+                result = measure(
+                    func, repeat=repeat, clear_cache=mode == 'cold',
+                )
+                results.append({
+                    'dataset': dataset,
+                    'view': view,
+                    'cache': mode,
+                    **result,
+                })
+                print(f'{size:>8} {view:>13} {mode:>5} '
+                      f'{result["queries"]:>8} {result["p50_ms"]:>9} '
+                      f'{result["p95_ms"]:>9} {result["p99_ms"]:>9} '
+                      f'{result["peak_memory_kib"]:>10}')
+    return results
+
+
+def report(results: list, repeat: int) -> dict:
+    import django
+    from django.conf import settings
+
+    return {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'settings': {
+            'FOLLOW_FEED_MODE': settings.FOLLOW_FEED_MODE,
+            'POSTS_PER_PAGE': settings.POSTS_PER_PAGE,
+        },
+        'repeat': repeat,
+        'seed': SEED,
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """Print relative changes of the metrics against a baseline run."""
+    def key(result):
+        return result['dataset']['posts'], result['view'], result['cache']
+
+    previous = {key(result): result for result in baseline['results']}
+    print(f'\nChanges against {baseline.get("commit") or "baseline"}:')
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            if old[metric]:
+                change = (result[metric] - old[metric]) / old[metric] * 100
+                changes.append(f'{metric} {change:+.0f}%')
+        print(f'{key(result)[0]:>8} {key(result)[1]:>13} '
+              f'{key(result)[2]:>5}  ' + ', '.join(changes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--posts', type=int, nargs='+', default=[1000, 10000, 100000],
+        help='dataset sizes in posts',
+    )
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument(
+        '--output', default='benchmark-views.json',
+        help='file to save results to',
+    )
+    parser.add_argument(
+        '--baseline', help='results of a previous run to compare with',
+    )
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        results = run(args.posts, args.repeat)
+
+    current = report(results, args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(current, output, ensure_ascii=False, indent=2)
+    print(f'\nSaved to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline:
+            compare(json.load(baseline), current)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,24 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import get_backend as get_search_backend
+
+
+class IndexedSearchMixin:
+    """Search objects through the search backend, the full-text
+    index where the database supports it."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return get_search_backend().filter(queryset, search_term), False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = (
+        'pk', 'text', 'pub_date', 'author', 'group', 'comments_count',
+    )
     search_fields = ('text',)
     list_filter = ('pub_date', 'author', 'group',)
     empty_value_display = '-пусто-'
@@ -19,7 +32,7 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'author', 'post', 'created')
     search_fields = ('text',)
     list_filter = ('author', 'created',)
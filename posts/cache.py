@@ -0,0 +1,89 @@
+"""Versioned cache keys for feed fragments and pages.
+
+Every feed depends on one or more scopes: all posts, a group, an author
+or a user's subscriptions. Each scope has a version counter which is
+bumped once a change of its content is committed. Versions are a part
+of fragment and page cache keys, so fragments can be cached for a long
+time and still are never served after the data they show has changed.
+
+The time of the last bump of every scope is kept too, to tell clients
+when a feed was last modified.
+"""
+import time
+from functools import partial
+from typing import Set
+
+from django.core.cache import cache
+from django.db import transaction
+
+FEED_VERSION_KEY = 'feeds:{scope}:version'
+FEED_MODIFIED_KEY = 'feeds:{scope}:modified'
+
+ALL_POSTS = 'posts'
+
+
+def group_scope(group_id) -> str:
+    return f'group:{group_id}'
+
+
+def author_scope(author_id) -> str:
+    return f'author:{author_id}'
+
+
+def follows_scope(user_id) -> str:
+    return f'follows:{user_id}'
+
+
+def feed_version(*scopes: str) -> str:
+    """Return a combined version of the scopes."""
+    keys = [FEED_VERSION_KEY.format(scope=scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A version starts from the current time, so a version lost
+            # by the cache never repeats an already used one.
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def feed_last_modified(*scopes: str) -> float:
+    """Return the timestamp of the latest change of the scopes."""
+    keys = [FEED_MODIFIED_KEY.format(scope=scope) for scope in scopes]
+    times = cache.get_many(keys)
+    if len(times) < len(keys):
+        # Changes made before the time was lost are not known.
+        now = time.time()
+        for key in keys:
+            if key not in times:
+                cache.add(key, now, None)
+                times[key] = cache.get(key, now)
+    return max(times.values())
+
+
+def bump_feed_versions(*scopes: str) -> None:
+    """Invalidate cached fragments and pages of the feeds of the scopes
+    once the current transaction is committed.
+
+    A version bumped before the commit would let a concurrent request,
+    which does not see the changes yet, cache the old data under
+    the new version.
+    """
+    scopes = set(scopes)
+    if scopes:
+        transaction.on_commit(partial(_bump, scopes))
+
+
+def _bump(scopes: Set[str]) -> None:
+    now = time.time()
+    cache.set_many(
+        {FEED_MODIFIED_KEY.format(scope=scope): now for scope in scopes},
+        None,
+    )
+    for scope in scopes:
+        key = FEED_VERSION_KEY.format(scope=scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Nothing is cached for the scope yet.
+            pass
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Feed versions are bumped in the cache of the process making
+    a change, so feeds are invalidated only in processes sharing it."""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'The default cache is local to every process, so changes made '
+        'in one process do not invalidate feeds cached by the others.',
+        hint='Set CACHE_LOCATION to the addresses of memcached servers.',
+        id='posts.W001',
+    )]
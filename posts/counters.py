@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+TOTAL_POSTS_COUNT_KEY = 'posts:total_count'
+
+
+def total_posts_count() -> int:
+    """Return a cached number of all posts.
+
+    The value is counted once per ``POSTS_COUNT_CACHE_TIMEOUT`` and
+    adjusted on post creation and deletion in between, so it is an
+    estimate which never drifts for longer than the timeout.
+    """
+    return cache.get_or_set(
+        TOTAL_POSTS_COUNT_KEY,
+        Post.objects.count,
+        settings.POSTS_COUNT_CACHE_TIMEOUT,
+    )
+
+
+def adjust_total_posts_count(delta: int) -> None:
+    try:
+        cache.incr(TOTAL_POSTS_COUNT_KEY, delta)
+    except ValueError:
+        # Nothing is cached yet, the next read counts the posts.
+        pass
+
+
+def followed_posts_count(user: User) -> int:
+    """Return number of posts written by authors a user follows."""
+    total = UserStats.objects.filter(
+        user__following__user=user,
+    ).aggregate(total=Sum('posts_count'))['total']
+    return total or 0
+
+
+def adjust(queryset, field: str, delta: int) -> None:
+    """Atomically add delta to a counter field of every object in a
+    queryset. Counters never go below zero, even if they have drifted.
+    """
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def adjust_posts_count(author_id, group_id, delta: int) -> None:
+    """Add delta to the post counters of an author and a group."""
+    adjust(UserStats.objects.filter(user_id=author_id), 'posts_count', delta)
+    if group_id is not None:
+        adjust(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def count_of(model, field: str, outer: str = 'pk') -> Coalesce:
+    """Return an expression counting rows of a model whose field
+    points at the ``outer`` field of the updated row."""
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def user_stats(user: User) -> UserStats:
+    """Return counters of a user, counting them if the user has none,
+    e.g. being loaded by ``loaddata``, which sends raw signals."""
+    stats = getattr(user, 'stats', None)
+    if stats is None:
+        stats, _created = UserStats.objects.get_or_create(user=user, defaults={
+            'posts_count': user.posts.count(),
+            'followers_count': user.following.count(),
+            'following_count': user.follower.count(),
+        })
+        user.stats = stats
+    return stats
+
+
+def create_missing_user_stats() -> None:
+    UserStats.objects.bulk_create(
+        [UserStats(user=user) for user in User.objects.filter(stats=None)]
+    )
+
+
+def rebuild_posts_counters() -> None:
+    """Recount posts of every group and author from scratch."""
+    Group.objects.update(posts_count=count_of(Post, 'group'))
+    create_missing_user_stats()
+    UserStats.objects.update(
+        posts_count=count_of(Post, 'author', outer='user'),
+    )
+    cache.delete(TOTAL_POSTS_COUNT_KEY)
+
+
+def rebuild_comments_counters() -> None:
+    """Recount comments of every post from scratch."""
+    Post.objects.update(comments_count=count_of(Comment, 'post'))
+
+
+def rebuild_follows_counters() -> None:
+    """Recount followers and followed authors of every user."""
+    create_missing_user_stats()
+    UserStats.objects.update(
+        followers_count=count_of(Follow, 'author', outer='user'),
+        following_count=count_of(Follow, 'user', outer='user'),
+    )
@@ -0,0 +1,173 @@
+"""Reproducible synthetic datasets for load testing.
+
+The same arguments and seed always produce the same rows, so changes
+can be measured against identical databases. Author activity and
+popularity follow a power law: a few users write most posts and get
+most followers, the way it happens on real sites.
+
+Rows are inserted with ``bulk_create`` under explicit primary keys
+continuing the existing ones, so no ids have to be read back.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Dict, Iterator, List
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import transaction
+from django.db.models import Max
+
+from .cache import ALL_POSTS, bump_feed_versions
+from .models import Comment, Follow, Group, Post, User
+from .transfer import (batches, preserved_dates, rebuild_derived_data,
+                       reset_sequences)
+
+START_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+POSTS_SPAN = timedelta(days=365)
+MAX_COMMENT_DELAY = timedelta(days=7).total_seconds()
+GROUP_POSTS_SHARE = 0.5
+WORDS = (
+    'кот пёс город дом лес река море небо солнце дождь снег ветер '
+    'утро вечер ночь день неделя год книга фильм музыка песня кофе '
+    'чай работа отпуск поезд самолёт дорога друг семья школа код '
+    'проект идея вопрос ответ новость история фото прогулка парк '
+    'сегодня вчера завтра снова очень просто тихо быстро красиво '
+    'новый старый большой маленький интересный весёлый грустный'
+).split()
+
+
+def power_law_weights(n: int, alpha: float) -> List[float]:
+    """Return cumulative weights of n items, the k-th of which
+    is picked with probability proportional to 1 / k ** alpha."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, n + 1)))
+
+
+class DatasetGenerator:
+    def __init__(self, users: int, groups: int, posts: int, comments: int,
+                 follows: int, alpha: float = 1.1, seed: int = 0,
+                 batch_size: int = 5000):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.weights = power_law_weights(users, alpha)
+        self.group_weights = power_law_weights(groups, alpha)
+        self.first_pk = {
+            model: (model.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+            for model in (User, Group, Post, Comment, Follow)
+        }
+
+    def user_pk(self, index: int) -> int:
+        return self.first_pk[User] + index
+
+    def popular_users(self, k: int) -> List[int]:
+        """Return indexes of k users picked by the power law."""
+        return self.random.choices(
+            range(self.users), cum_weights=self.weights, k=k,
+        )
+
+    def text(self, min_words: int, max_words: int) -> str:
+        words = self.random.choices(
+            WORDS, k=self.random.randint(min_words, max_words),
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def post_date(self, index: int) -> datetime:
+        return START_DATE + POSTS_SPAN * index / max(self.posts, 1)
+
+    def generate_users(self) -> Iterator[User]:
+        for index in range(self.users):
+            pk = self.user_pk(index)
+            yield User(
+                pk=pk,
+                username=f'user{pk}',
+                password=UNUSABLE_PASSWORD_PREFIX,
+                date_joined=START_DATE,
+            )
+
+    def generate_groups(self) -> Iterator[Group]:
+        for index in range(self.groups):
+            pk = self.first_pk[Group] + index
+            yield Group(
+                pk=pk,
+                title=f'Группа {pk}',
+                slug=f'group-{pk}',
+                description=self.text(5, 20),
+            )
+
+    def generate_posts(self) -> Iterator[Post]:
+        for batch in batches(range(self.posts), self.batch_size):
+            authors = self.popular_users(len(batch))
+            for index, author in zip(batch, authors):
+                group_id = None
+                if self.groups and self.random.random() < GROUP_POSTS_SHARE:
+                    group_id = self.first_pk[Group] + self.random.choices(
+                        range(self.groups), cum_weights=self.group_weights,
+                    )[0]
+                yield Post(
+                    pk=self.first_pk[Post] + index,
+                    author_id=self.user_pk(author),
+                    group_id=group_id,
+                    text=self.text(5, 60),
+                    pub_date=self.post_date(index),
+                )
+
+    def generate_comments(self) -> Iterator[Comment]:
+        for batch in batches(range(self.comments), self.batch_size):
+            authors = self.popular_users(len(batch))
+            for index, author in zip(batch, authors):
+                post = self.random.randrange(self.posts)
+                delay = self.random.uniform(0, MAX_COMMENT_DELAY)
+                yield Comment(
+                    pk=self.first_pk[Comment] + index,
+                    post_id=self.first_pk[Post] + post,
+                    author_id=self.user_pk(author),
+                    text=self.text(1, 20),
+                    created=self.post_date(post) + timedelta(seconds=delay),
+                )
+
+    def generate_follows(self) -> Iterator[Follow]:
+        """Every user picks on average ``follows`` authors, popular
+        authors get most of the followers. Repeated picks of the same
+        author make a single subscription."""
+        pk = self.first_pk[Follow]
+        for user in range(self.users):
+            count = self.random.randint(0, 2 * self.follows)
+            authors = set(self.popular_users(count)) - {user}
+            for author in sorted(authors):
+                yield Follow(
+                    pk=pk,
+                    user_id=self.user_pk(user),
+                    author_id=self.user_pk(author),
+                )
+                pk += 1
+
+    def insert(self, model, objs: Iterator) -> int:
+        count = 0
+        with preserved_dates(model):
+            for batch in batches(objs, self.batch_size):
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                count += len(batch)
+        return count
+
+    def generate(self) -> Dict[str, int]:
+        """Insert the dataset, return numbers of inserted rows."""
+        if not self.users and (self.posts or self.comments):
+            raise ValueError('Posts and comments need authors.')
+        if not self.posts and self.comments:
+            raise ValueError('Comments need posts.')
+        counts = {
+            'users': self.insert(User, self.generate_users()),
+            'groups': self.insert(Group, self.generate_groups()),
+            'posts': self.insert(Post, self.generate_posts()),
+            'comments': self.insert(Comment, self.generate_comments()),
+            'follows': self.insert(Follow, self.generate_follows()),
+        }
+        reset_sequences()
+        rebuild_derived_data()
+        bump_feed_versions(ALL_POSTS)
+        return counts
@@ -1,34 +1,110 @@
 from functools import wraps
+from hashlib import md5
+from typing import Callable, List, Optional
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse
-
-from posts.models import Post, User
-
-
-def author_access(view_func):
-    @wraps(view_func)
-    def wrapped_view(request, username, post_id):
-        post = get_object_or_404(Post, id=post_id)
-        if request.user != post.author:
-            return redirect(reverse('posts:post', kwargs={
-                'post_id': post_id,
-                'username': username,
-            }))
-        return view_func(request, username, post_id)
-    return wrapped_view
-
-
-def check_author_username(view_func):
-    @wraps(view_func)
-    def wrapped_view(request, username, post_id):
-        user = get_object_or_404(User, username=username)
-        post = get_object_or_404(Post, id=post_id)
-        if post.author != user:
-            return redirect(
-                request.path,
-                username=post.author.username,
-                post_id=post_id
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from posts.cache import feed_last_modified, feed_version
+from posts.models import Post
+from yatube.cache import get_or_rebuild
+from yatube.replicas import replica_cache
+
+PAGE_CACHE_KEY = 'feeds:page:{path}:{version}'
+# Query parameters selecting a feed page, others do not change it.
+PAGE_PARAMETERS = ('page', 'after', 'before')
+
+
+def resolve_post(author_only: bool = False):
+    """Fetch a post from URL kwargs and attach it to the request.
+
+    The post is fetched with its author in a single query and stored
+    as ``request.post`` for the view to reuse. A URL with a wrong
+    username is redirected to the one of the post author.
+    If ``author_only`` is set, users other than the author are
+    redirected to the post page.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, username, post_id):
+            post = get_object_or_404(
+                Post.objects.for_feed().select_related('author__stats'),
+                id=post_id,
+            )
+            if post.author.username != username:
+                return redirect(
+                    request.resolver_match.view_name,
+                    username=post.author.username,
+                    post_id=post_id,
+                )
+            if author_only and request.user != post.author:
+                return redirect(
+                    'posts:post',
+                    username=username,
+                    post_id=post_id,
+                )
+            request.post = post
+            return view_func(request, username, post_id)
+        return wrapped_view
+    return decorator
+
+
+def page_cache_key(request, version: str) -> str:
+    parameters = [
+        (name, request.GET.get(name)) for name in PAGE_PARAMETERS
+        if name in request.GET
+    ]
+    path = md5(f'{request.path}?{parameters}'.encode()).hexdigest()
+    return PAGE_CACHE_KEY.format(path=path, version=version)
+
+
+def cache_anonymous_page(get_scopes: Callable[..., Optional[List[str]]]):
+    """Cache whole feed pages rendered for anonymous users.
+
+    ``get_scopes`` is called with the URL kwargs of a view and returns
+    the feed cache scopes of the page, or None if there is no such
+    page. Pages are cached by path and page under the version of their
+    scopes, so any change of their content invalidates them.
+
+    Responses carry an ETag made of the version and the time of the
+    last change as Last-Modified, so conditional requests are answered
+    with 304 Not Modified without rendering anything.
+
+    Works only with ``ANONYMOUS_PAGE_CACHE`` set, which needs a cache
+    shared by all processes: otherwise a process that missed a change
+    would keep answering with its stale page.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, **kwargs):
+            if (not settings.ANONYMOUS_PAGE_CACHE
+                    or request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view_func(request, **kwargs)
+            scopes = get_scopes(**kwargs)
+            if scopes is None:
+                return view_func(request, **kwargs)
+
+            version = feed_version(*scopes)
+            etag = quote_etag(version)
+            last_modified = int(feed_last_modified(*scopes))
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified,
             )
-        return view_func(request, username, post_id)
-    return wrapped_view
+            if response is None:
+                key, timeout = replica_cache(
+                    page_cache_key(request, version),
+                    settings.FEED_CACHE_TIMEOUT,
+                )
+                response = get_or_rebuild(
+                    key, lambda: view_func(request, **kwargs), timeout,
+                )
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Caches have to revalidate the page, which is cheap.
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapped_view
+    return decorator
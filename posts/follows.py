@@ -0,0 +1,73 @@
+from typing import FrozenSet, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .counters import followed_posts_count
+from .models import Follow, User
+from .paginator import MergedFeed
+
+FOLLOWED_AUTHORS_KEY = 'follows:{user_id}:authors'
+TOO_MANY_AUTHORS = 'too-many'
+
+
+def followed_author_ids(user: User) -> Optional[FrozenSet[int]]:
+    """Return cached ids of authors a user follows.
+
+    Return None if a user follows more than
+    ``FOLLOWED_AUTHORS_CACHE_LIMIT`` authors: such sets are not cached.
+    """
+    key = FOLLOWED_AUTHORS_KEY.format(user_id=user.pk)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        limit = settings.FOLLOWED_AUTHORS_CACHE_LIMIT
+        ids = list(
+            Follow.objects.filter(user=user)
+            .values_list('author_id', flat=True)[:limit + 1]
+        )
+        author_ids = frozenset(ids) if len(ids) <= limit else TOO_MANY_AUTHORS
+        cache.set(key, author_ids, settings.FOLLOWED_AUTHORS_CACHE_TIMEOUT)
+    if author_ids == TOO_MANY_AUTHORS:
+        return None
+    return author_ids
+
+
+def forget_followed_authors(user_id: int) -> None:
+    cache.delete(FOLLOWED_AUTHORS_KEY.format(user_id=user_id))
+
+
+def is_following(user: User, author: User) -> bool:
+    """Return True if a user follows an author.
+
+    The answer comes from the cached set of followed author ids,
+    or from an EXISTS query for users who follow too many authors.
+    """
+    if not user.is_authenticated or user.pk == author.pk:
+        return False
+    author_ids = followed_author_ids(user)
+    if author_ids is None:
+        return Follow.objects.filter(user=user, author=author).exists()
+    return author.pk in author_ids
+
+
+class FollowedFeed(MergedFeed):
+    """Follow feed of a user read from the posts table, newest first.
+
+    Posts of every followed author are read from the author index,
+    a page at most, and merged, so the feed does not scan the posts
+    of authors the user does not follow.
+    """
+
+    def __init__(self, user: User):
+        self.user = user
+
+    def count(self) -> int:
+        return followed_posts_count(self.user)
+
+    def author_ids(self) -> Iterable[int]:
+        author_ids = followed_author_ids(self.user)
+        if author_ids is None:
+            return Follow.objects.filter(
+                user=self.user,
+            ).values_list('author_id', flat=True)
+        return author_ids
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
+from posts.images import downscale
 from posts.models import Comment, Post
 
 
@@ -12,8 +15,49 @@ class PostForm(forms.ModelForm):
                 'required': ('Поле текста записи не должно быть пустым '
                              'или состоять только из пробелов.'),
             },
+            'image': {
+                'too_large': 'Размер файла не должен превышать %(limit)s.',
+                'too_many_pixels': ('Изображение не должно быть больше '
+                                    '%(limit)s мегапикселей.'),
+            },
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Files over the limit are discarded while uploading and only
+        # their size is left, they must not reach the image validation.
+        name = self.add_prefix('image')
+        image = self.files.get(name)
+        self.image_too_large = (
+            image is not None and image.size > settings.UPLOAD_MAX_BYTES
+        )
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files[name]
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        error_messages = self.fields['image'].error_messages
+        if self.image_too_large:
+            raise forms.ValidationError(
+                error_messages['too_large'],
+                code='too_large',
+                params={'limit': filesizeformat(settings.UPLOAD_MAX_BYTES)},
+            )
+        if not image or 'image' not in self.changed_data:
+            return image
+
+        # Dimensions come from the header read by the field,
+        # the pixels have not been decoded yet.
+        width, height = image.image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'limit': settings.IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        return downscale(image, settings.IMAGE_MAX_SIDE)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
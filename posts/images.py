@@ -0,0 +1,95 @@
+"""Downscaling of uploaded post images and removal of unused ones.
+
+Identical images are stored once and shared between posts, so a file
+is deleted only when no post refers to it anymore.
+
+A post may be saved with an image which is being deleted with the last
+post using it: the upload finds the file stored and skips writing it,
+then the file is deleted. References are counted and the file deleted
+in one write transaction, and the saved post writes the file again
+once it is committed if it is missing. Write transactions exclude each
+other (see the IMMEDIATE transaction mode in settings), so the post is
+either committed before the count and keeps the file, or after the
+deletion and restores it.
+"""
+import logging
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def downscale(file, max_side: int):
+    """Return an uploaded image fitted into a max_side square,
+    or the file itself if it already fits."""
+    with Image.open(file) as image:
+        if (max(image.size) <= max_side
+                or getattr(image, 'is_animated', False)):
+            file.seek(0)
+            return file
+        format_ = image.format
+        # JPEG images are decoded right at a reduced scale.
+        image.draft(image.mode, (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+
+        # Spills over to disk the way uploads do.
+        buffer = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE,
+        )
+        image.save(buffer, format_, **SAVE_OPTIONS.get(format_, {}))
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadedFile(
+        file=buffer,
+        name=file.name,
+        content_type=file.content_type,
+        size=size,
+    )
+
+
+def image_references(name: str) -> int:
+    """Return number of posts sharing an image."""
+    return Post.objects.filter(image=name).count()
+
+
+def release_image(name: str) -> None:
+    """Delete an image and its thumbnails once the current transaction
+    is committed, unless another post still refers to it."""
+    if not name:
+        return
+
+    def delete_unused():
+        with transaction.atomic():
+            if image_references(name):
+                return
+            try:
+                delete(ImageFile(name, Post.image.field.storage))
+            except (OSError, SuspiciousFileOperation):
+                # A leftover file must not fail the request which freed it.
+                logger.exception('Could not delete unused image %s', name)
+
+    transaction.on_commit(delete_unused)
+
+
+def restore_image(name: str, content) -> None:
+    """Write a saved image again once the current transaction is
+    committed, if it has been deleted in the meantime."""
+    transaction.on_commit(
+        lambda: Post.image.field.storage.restore(name, content)
+    )
@@ -0,0 +1,40 @@
+import re
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+CONTENT_ADDRESSED_RE = re.compile(
+    r'[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$'
+)
+
+
+class Command(BaseCommand):
+    help = ('Переносит изображения, загруженные до хранения по хешу '
+            'содержимого, и удаляет их дубликаты.')
+
+    def handle(self, *args, **options):
+        storage = Post.image.field.storage
+        names = (
+            Post.objects.exclude(image='').exclude(image=None)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        moved = missing = 0
+        for name in list(names):
+            if CONTENT_ADDRESSED_RE.search(name):
+                continue
+            try:
+                with storage.open(name) as content:
+                    new_name = storage.save(name, content)
+            except FileNotFoundError:
+                missing += 1
+                continue
+            # Saved one by one, so signals invalidate the cached feeds
+            # and delete the old file once no post refers to it.
+            for post in Post.objects.filter(image=name):
+                post.image.name = new_name
+                post.save(update_fields=['image'])
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено изображений: {moved}, не найдено: {missing}.'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_rows
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, записи, комментарии '
+            'и подписки в формате NDJSON. Выгрузка содержит хеши '
+            'паролей пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл для выгрузки, «-» — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Число строк, читаемых из базы за один запрос.',
+        )
+
+    def handle(self, *args, path, batch_size, **options):
+        if path == '-':
+            count = export_rows(self.stdout, batch_size)
+        else:
+            with open(path, 'w', encoding='utf-8') as stream:
+                count = export_rows(stream, batch_size)
+        self.stderr.write(self.style.SUCCESS(f'Выгружено строк: {count}.'))
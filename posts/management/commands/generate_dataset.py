@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = ('Создаёт воспроизводимый набор данных для нагрузочного '
+            'тестирования: пользователей, группы, записи, комментарии '
+            'и подписки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Показатель степенного распределения активности авторов.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Число строк, вставляемых в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        started = time.perf_counter()
+        try:
+            counts = generator.generate()
+        except ValueError as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - started
+
+        summary = ', '.join(
+            f'{name}: {count}' for name, count in counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано за {elapsed:.1f} с — {summary}.'
+        ))
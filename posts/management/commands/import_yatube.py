@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import import_rows, rebuild_derived_data
+
+
+class Command(BaseCommand):
+    help = ('Загружает данные, выгруженные командой export_yatube. '
+            'Файлы изображений переносятся отдельно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл выгрузки, «-» — стандартный ввод.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Число строк, вставляемых в одной транзакции.',
+        )
+
+    def handle(self, *args, path, batch_size, **options):
+        if path == '-':
+            count = import_rows(sys.stdin, batch_size)
+        else:
+            with open(path, encoding='utf-8') as stream:
+                count = import_rows(stream, batch_size)
+        rebuild_derived_data()
+        self.stdout.write(self.style.SUCCESS(f'Загружено строк: {count}.'))
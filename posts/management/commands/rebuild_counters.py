@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import (rebuild_comments_counters,
+                            rebuild_follows_counters,
+                            rebuild_posts_counters)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_posts_counters()
+            rebuild_comments_counters()
+            rebuild_follows_counters()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
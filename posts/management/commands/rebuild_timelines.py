@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.timelines import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = ('Заполняет ленты подписок заново. Нужно выполнить перед '
+            'переключением FOLLOW_FEED_MODE в режим "write".')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок заполнены.'))
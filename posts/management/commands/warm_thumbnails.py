@@ -0,0 +1,46 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.cache import bump_feed_versions
+from posts.models import Post
+from posts.signals import post_scopes
+from posts.thumbnails import generate_thumbnails, init_worker
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры изображений существующих постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Число процессов, 0 — создавать в текущем процессе.',
+        )
+
+    def handle(self, *args, workers, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).order_by()
+        names = (
+            posts.values_list('image', flat=True).distinct().iterator()
+        )
+        if workers:
+            with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+                count = sum(1 for _result in pool.map(
+                    generate_thumbnails, names, chunksize=16
+                ))
+        else:
+            count = 0
+            for name in names:
+                generate_thumbnails(name)
+                count += 1
+        # Cached feeds still show the original images.
+        owners = posts.values_list('author_id', 'group_id').distinct()
+        bump_feed_versions(*chain.from_iterable(
+            post_scopes(*owner) for owner in owners.iterator()
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {count}.'
+        ))
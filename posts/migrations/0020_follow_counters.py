@@ -0,0 +1,42 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counters(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def count_follows(field):
+        rows = Follow.objects.filter(**{field: OuterRef('user')}).order_by()
+        return Coalesce(Subquery(
+            rows.values(field).annotate(count=Count('pk')).values('count')
+        ), 0)
+
+    UserStats.objects.update(
+        followers_count=count_follows('author'),
+        following_count=count_follows('user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписок'),
+        ),
+        migrations.RunPython(fill_follow_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:26
+
+from django.db import migrations, models
+import yatube.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_timelines'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=yatube.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Posts and comments share the table, the row id is pk * 2 + kind.
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE "SearchIndex" '
+        "USING fts5(text, tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        'INSERT INTO "SearchIndex" (rowid, text) '
+        'SELECT "id" * 2, "text" FROM "Posts"'
+    )
+    schema_editor.execute(
+        'INSERT INTO "SearchIndex" (rowid, text) '
+        'SELECT "id" * 2 + 1, "text" FROM "Comments"'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE "SearchIndex"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -3,18 +3,45 @@ from typing import Optional
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from yatube.storage import ContentAddressedStorage
 from yatube.utils import wrap_text
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersModel(models.Model):
+    """Base model for models with denormalized counters.
+
+    Counter fields listed in ``counter_fields`` are updated in place by
+    signal handlers, so saving an already existing object never writes
+    them back: otherwise a stale in-memory value would overwrite
+    the counter.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        return super().save(*args, **kwargs)
+
+
+class Group(CountersModel):
     """Model for a group object.
 
     Properties:
     title -- a name of a group.
     slug -- a group address, a part of URL. Has to be unique.
     description -- group info.
+    posts_count -- number of posts in a group, kept up to date by signals.
     """
     title = models.CharField(
         verbose_name='Имя группы',
@@ -35,6 +62,13 @@ class Group(models.Model):
         verbose_name='Описание группы',
         help_text='Введите краткое описание вашей группы.',
     )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число публикаций',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('posts_count',)
 
     class Meta:
         db_table = 'Groups'
@@ -45,7 +79,24 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Return posts with everything a post card renders fetched
+        in the same query."""
+        return self.select_related('author', 'group')
+
+    def followed_by(self, user):
+        """Return posts of authors a user follows.
+
+        Followed authors are selected by a subquery, so the feed is
+        a single query whatever the number of subscriptions is.
+        """
+        return self.filter(
+            author__in=Follow.objects.filter(user=user).values('author'),
+        )
+
+
+class Post(CountersModel):
     """Model for a post object.
 
     Properties:
@@ -53,6 +104,7 @@ class Post(models.Model):
     pub_date -- publication date.
     author -- name of author.
     group -- name of group where post is published.
+    comments_count -- number of comments, kept up to date by signals.
     """
     text = models.TextField(
         verbose_name='Текст публикации',
@@ -64,13 +116,14 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True,
-        db_index=True,
     )
+    # Foreign keys are covered by the feed indexes in Meta.
     author = models.ForeignKey(
         User,
         verbose_name='Автор публикации',
         on_delete=models.CASCADE,
         related_name='posts',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -79,21 +132,50 @@ class Post(models.Model):
         null=True,
         on_delete=models.SET_NULL,
         related_name='posts',
+        db_index=False,
         help_text=('Выберите группу, в которой пост будет опубликован '
                    'или оставьте поле пустым.')
     )
     image = models.ImageField(
         verbose_name='Изображение',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
-        null=True
+        null=True,
+        # Looked up to tell whether a shared image is still in use.
+        db_index=True,
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    counter_fields = ('comments_count',)
 
     class Meta:
         db_table = 'Posts'
         ordering = ('-pub_date',)
         verbose_name = 'Публикация'
         verbose_name_plural = 'Публикации'
+        # Feeds are filtered by one column and ordered by the keyset
+        # pagination key, so pages are read from an index in order.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_id_idx',
+            ),
+        ]
 
     def __str__(self):
         text = wrap_text(self.text)
@@ -119,6 +201,7 @@ class Comment(models.Model):
         verbose_name='Запись',
         related_name='comments',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -140,6 +223,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         text = wrap_text(self.text)
@@ -152,9 +241,50 @@ class Comment(models.Model):
         )
 
 
+class UserStats(models.Model):
+    """Denormalized per-user counters.
+
+    Properties:
+    user -- a user the counters belong to.
+    posts_count -- number of posts written by a user.
+    followers_count -- number of users following a user.
+    following_count -- number of authors a user follows.
+    """
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число публикаций',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Число подписок',
+        default=0,
+    )
+
+    class Meta:
+        db_table = 'UserStats'
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return (f'Пользователь: {self.user}\n'
+                f'Публикаций: {self.posts_count}\n'
+                f'Подписчиков: {self.followers_count}\n'
+                f'Подписок: {self.following_count}\n')
+
+
 class FollowQuerySet(models.QuerySet):
     def authors(self):
-        return {follow.author for follow in self}
+        """Return followed authors as a single query."""
+        return User.objects.filter(pk__in=self.values('author'))
 
 
 class Follow(models.Model):
@@ -169,6 +299,7 @@ class Follow(models.Model):
         verbose_name='Автор',
         related_name='following',
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     objects = FollowQuerySet.as_manager()
@@ -177,7 +308,15 @@ class Follow(models.Model):
         db_table = 'Follows'
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        # The unique index serves lookups by user, this one
+        # the followers of an author.
         unique_together = ('user', 'author')
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
 
     def __str__(self):
         return (f'Автор: {self.author}\n'
@@ -187,3 +326,45 @@ class Follow(models.Model):
         if self.author != self.user:
             return super().save(*args, **kwargs)
         return None
+
+
+class TimelineEntry(models.Model):
+    """A post pushed into a follower's materialized follow feed.
+
+    Properties:
+    user -- a follower owning the timeline.
+    post -- a post of a followed author.
+    pub_date -- publication date of the post, orders and trims
+                the timeline.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Запись',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        db_table = 'Timelines'
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_post_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return (f'Подписчик: {self.user}\n'
+                f'Запись: {self.post_id}\n')
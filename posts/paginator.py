@@ -0,0 +1,263 @@
+import datetime as dt
+import heapq
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .models import Post
+
+# (pub_date, post id), the feed ordering key.
+Key = Tuple[dt.datetime, int]
+
+# Terms a compound SELECT may have in SQLite.
+MAX_COMPOUND_SELECT = 500
+# Author id the query of author posts is compiled with.
+AUTHOR_PLACEHOLDER = 0
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = dt.timedelta(microseconds=1)
+
+
+def encode_cursor(post) -> str:
+    """Return a URL-safe cursor pointing at a post.
+
+    The cursor is the post publication date in microseconds since
+    the epoch and the post id separated by a dot.
+    """
+    micros = (post.pub_date - EPOCH) // MICROSECOND
+    return f'{micros}.{post.pk}'
+
+
+def decode_cursor(cursor: str) -> Tuple[dt.datetime, int]:
+    """Return ``(pub_date, id)`` pair encoded in a cursor.
+
+    Raise ValueError or OverflowError if the cursor is malformed.
+    """
+    micros, pk = cursor.split('.')
+    return EPOCH + int(micros) * MICROSECOND, int(pk)
+
+
+class KeysetPaginator(Paginator):
+    """Paginator for post feeds ordered by ``(pub_date, id)``.
+
+    A page requested together with the cursor of a neighbour page is
+    fetched with a range condition on the ordering key, so its cost
+    does not depend on how deep the page is. A page requested by its
+    number only falls back to the regular OFFSET query.
+
+    Pages are plain ``Page`` objects with ``next_cursor`` and
+    ``previous_cursor`` attributes set.
+
+    If ``count`` is passed, it is used instead of counting objects
+    with ``COUNT(*)``.
+    """
+    ordering = ('-pub_date', '-id')
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 count: Optional[int] = None, **kwargs):
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+        if count is not None:
+            self.count = count
+
+    def get_page(self, number, after: Optional[str] = None,
+                 before: Optional[str] = None) -> Page:
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            number, after, before = 1, None, None
+        except EmptyPage:
+            number, after, before = self.num_pages, None, None
+        return self.page(number, after=after, before=before)
+
+    def page(self, number, after: Optional[str] = None,
+             before: Optional[str] = None) -> Page:
+        number = self.validate_number(number)
+        try:
+            if after:
+                pub_date, pk = decode_cursor(after)
+                page = self._get_page(
+                    list(self._after(pub_date, pk)), number, self
+                )
+            elif before:
+                pub_date, pk = decode_cursor(before)
+                posts = list(self._before(pub_date, pk))
+                page = self._get_page(posts[::-1], number, self)
+            else:
+                page = super().page(number)
+        except (ValueError, OverflowError):
+            page = super().page(number)
+
+        # Cursors are lazy, so a page rendered from a cached fragment
+        # never fetches its posts.
+        page.next_cursor = SimpleLazyObject(
+            lambda: self._cursor(page, -1) if page.has_next() else None
+        )
+        page.previous_cursor = SimpleLazyObject(
+            lambda: self._cursor(page, 0) if page.has_previous() else None
+        )
+        return page
+
+    def _cursor(self, page: Page, index: int) -> Optional[str]:
+        return encode_cursor(page[index]) if len(page) else None
+
+    def _after(self, pub_date: dt.datetime, pk: int) -> QuerySet:
+        return self.object_list.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        )[:self.per_page]
+
+    def _before(self, pub_date: dt.datetime, pk: int) -> QuerySet:
+        return self.object_list.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+        ).reverse()[:self.per_page]
+
+
+def beyond(key: Key, pk_field: str, lookup: str) -> Q:
+    """Return the condition of rows past a key in the feed ordering,
+    older for the ``lt`` lookup and newer for ``gt``."""
+    pub_date, pk = key
+    return (
+        Q(**{f'pub_date__{lookup}': pub_date})
+        | Q(pub_date=pub_date, **{f'{pk_field}__{lookup}': pk})
+    )
+
+
+# A compiled query and its parameters.
+Part = Tuple[str, list]
+
+
+def compile_query(queryset: QuerySet) -> Part:
+    return queryset.query.get_compiler(queryset.db).as_sql()
+
+
+def union_sql(parts: List[Part], limit: int, reverse: bool) -> Part:
+    """Return a UNION ALL query of up to limit first keys of the parts,
+    newest first if reverse is True.
+
+    Every part keeps its own ORDER BY and LIMIT, so each one is read
+    from its index and only the rows of a page are sorted.
+    """
+    direction = 'DESC' if reverse else 'ASC'
+    sql = (
+        ' UNION ALL '.join(f'SELECT * FROM ({sql})' for sql, _ in parts)
+        + f' ORDER BY 1 {direction}, 2 {direction} LIMIT %s'
+    )
+    params = [param for _sql, part_params in parts for param in part_params]
+    return sql, [*params, limit]
+
+
+class MergedFeed(ABC):
+    """Feed of posts merged from several sources, newest posts first.
+
+    Every source is read in the feed order from its own index, limited
+    to a page, and the sources are merged by ``(pub_date, id)`` with
+    a single UNION ALL query.
+
+    Posts of the authors returned by ``author_ids`` are read from the
+    author index, one source per author. The query of such a source is
+    compiled once and repeated with every author id.
+    """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Return number of posts in the feed."""
+
+    def sources(self) -> List[Tuple[QuerySet, str]]:
+        """Return querysets of the feed keys, ordered newest first,
+        with the name of their post id field."""
+        return []
+
+    def author_ids(self) -> Iterable[int]:
+        return []
+
+    def order_by(self, *ordering) -> 'MergedFeed':
+        # The feed has a single ordering, KeysetPaginator.ordering.
+        return self
+
+    def __getitem__(self, index: slice) -> List[Post]:
+        return self.posts(self.keys(index.stop)[index])
+
+    def parts(self, limit: int, after: Optional[Key] = None,
+              before: Optional[Key] = None) -> List[Part]:
+        """Return compiled queries of the sources, each limited
+        to the keys past a cursor."""
+        author_posts = Post.objects.filter(
+            author_id=AUTHOR_PLACEHOLDER,
+        ).order_by(*KeysetPaginator.ordering).values_list('pub_date', 'pk')
+        sources = [*self.sources(), (author_posts, 'pk')]
+        for idx, (source, pk_field) in enumerate(sources):
+            if after is not None:
+                source = source.filter(beyond(after, pk_field, 'lt'))
+            elif before is not None:
+                source = source.filter(
+                    beyond(before, pk_field, 'gt'),
+                ).reverse()
+            sources[idx] = compile_query(source[:limit])
+        author_sql, author_params = sources.pop()
+        # The author filter comes first, so is the first parameter.
+        author_param = author_params.index(AUTHOR_PLACEHOLDER)
+        return sources + [
+            (author_sql, [
+                *author_params[:author_param],
+                author_id,
+                *author_params[author_param + 1:],
+            ])
+            for author_id in self.author_ids()
+        ]
+
+    def keys(self, limit: int, after: Optional[Key] = None,
+             before: Optional[Key] = None) -> List[Key]:
+        """Return keys of up to limit newest posts, older than ``after``
+        if it is given. With ``before``, return keys of up to limit
+        oldest posts newer than it, oldest first."""
+        if not limit:
+            return []
+        parts = self.parts(limit, after, before)
+        reverse = before is None
+        chunks = []
+        with connections[Post.objects.db].cursor() as cursor:
+            for start in range(0, len(parts), MAX_COMPOUND_SELECT):
+                cursor.execute(*union_sql(
+                    parts[start:start + MAX_COMPOUND_SELECT], limit, reverse,
+                ))
+                chunks.append([tuple(row) for row in cursor.fetchall()])
+        return list(islice(heapq.merge(*chunks, reverse=reverse), limit))
+
+    def posts(self, keys: List[Key]) -> List[Post]:
+        posts = Post.objects.for_feed().in_bulk([pk for _date, pk in keys])
+        return [posts[pk] for _date, pk in keys if pk in posts]
+
+
+class MergedFeedPaginator(KeysetPaginator):
+    """Keyset paginator over a ``MergedFeed``."""
+
+    def _after(self, pub_date: dt.datetime, pk: int) -> List[Post]:
+        feed = self.object_list
+        return feed.posts(feed.keys(self.per_page, after=(pub_date, pk)))
+
+    def _before(self, pub_date: dt.datetime, pk: int) -> List[Post]:
+        feed = self.object_list
+        return feed.posts(feed.keys(self.per_page, before=(pub_date, pk)))
+
+
+def paginate(request: HttpRequest, posts: QuerySet, per_page: int,
+             count: Optional[int] = None,
+             paginator_class: type = KeysetPaginator) -> Page:
+    """Return a feed page requested by the ``page``, ``after``
+    and ``before`` query parameters.
+    """
+    paginator = paginator_class(posts, per_page, count=count)
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
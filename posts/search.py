@@ -0,0 +1,290 @@
+"""Full-text search over posts and comments.
+
+Texts are kept in a search index updated by signal handlers on every
+save and delete. The index is reached through a backend chosen by the
+``SEARCH_BACKEND`` setting. ``SQLiteSearchBackend`` stores it in an FTS5
+virtual table of the project database. On other databases
+``ContainsSearchBackend`` is used instead: it keeps no index and
+matches texts with ``icontains``.
+
+Results are ordered by relevance and paginated with a cursor holding
+the rank and the index row of the last result shown.
+"""
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Model, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import SafeString, mark_safe
+from django.utils.text import Truncator
+
+from .models import Comment, Post
+
+KINDS = (Post, Comment)
+MAX_QUERY_TERMS = 10
+# Control characters never met in a text mark matched terms in snippets
+# until the text around them is escaped.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 24
+
+
+class SearchHit(NamedTuple):
+    model: type
+    pk: int
+    snippet: SafeString
+    # Rank and index row, the point to continue the search from.
+    position: Tuple[float, int]
+
+
+class SearchResult(NamedTuple):
+    post: Post
+    comment: Optional[Comment]
+    snippet: SafeString
+
+
+class SearchPage(NamedTuple):
+    results: List[SearchResult]
+    next_cursor: Optional[str]
+
+
+def parse_query(text: str) -> str:
+    """Return user input as a query matching documents containing
+    all of its words. Query syntax is never passed through."""
+    terms = re.findall(r'\w+', text)[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def highlight(snippet: str) -> SafeString:
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def encode_cursor(position: Tuple[float, int]) -> str:
+    rank, row = position
+    return f'{rank!r}_{row}'
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Return the position of a cursor.
+
+    Raises ValueError for a malformed cursor.
+    """
+    rank, row = cursor.rsplit('_', 1)
+    return float(rank), int(row)
+
+
+class RawSubquery(RawSQL):
+    """Raw subquery for the right side of an ``__in`` lookup.
+
+    ``RawSQL`` is wrapped in a second pair of parentheses there, which
+    makes SQLite take it for a scalar subquery and use its first row.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+class SearchBackend(ABC):
+    """Interface of search index backends."""
+    # Database vendor the backend works with, None for any.
+    vendor = None
+
+    def row_id(self, model: type, pk: int) -> int:
+        return pk * len(KINDS) + KINDS.index(model)
+
+    def split_row_id(self, row_id: int) -> Tuple[type, int]:
+        pk, kind = divmod(row_id, len(KINDS))
+        return KINDS[kind], pk
+
+    @abstractmethod
+    def index(self, instance: Model) -> None:
+        """Add an object to the index or update its text there."""
+
+    @abstractmethod
+    def remove(self, instance: Model) -> None:
+        """Remove an object from the index."""
+
+    @abstractmethod
+    def search(self, query: str, limit: int,
+               after: Optional[Tuple[float, int]] = None) -> List[SearchHit]:
+        """Return up to limit best matching hits
+        positioned after the position of a previous hit."""
+
+    @abstractmethod
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        """Return objects of a queryset matching a query."""
+
+    @abstractmethod
+    def rebuild(self) -> None:
+        """Index all posts and comments from scratch."""
+
+
+class ContainsSearchBackend(SearchBackend):
+    """Search without an index for databases other than SQLite.
+
+    Texts containing all words of a query match it. All matches rank
+    the same and are ordered by row id, posts and comments together.
+    """
+
+    def index(self, instance: Model) -> None:
+        pass
+
+    def remove(self, instance: Model) -> None:
+        pass
+
+    def search(self, query: str, limit: int,
+               after: Optional[Tuple[float, int]] = None) -> List[SearchHit]:
+        hits = []
+        for kind, model in enumerate(KINDS):
+            objects = self.filter(model.objects.order_by('pk'), query)
+            if after is not None:
+                last_pk = (after[1] - kind) // len(KINDS)
+                objects = objects.filter(pk__gt=last_pk)
+            for pk, text in objects.values_list('pk', 'text')[:limit]:
+                hits.append(SearchHit(
+                    model, pk,
+                    snippet=escape(Truncator(text).words(SNIPPET_TOKENS)),
+                    position=(0.0, self.row_id(model, pk)),
+                ))
+        return sorted(hits, key=lambda hit: hit.position)[:limit]
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        terms = re.findall(r'\w+', query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(text__icontains=term)
+        return queryset
+
+    def rebuild(self) -> None:
+        pass
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Search index in an SQLite FTS5 table.
+
+    Posts and comments share one table, so their ranks are comparable.
+    The kind of an object is encoded in the row id,
+    ``pk * len(KINDS) + kind``, so updates and deletes find the row by
+    the primary key of the table.
+    """
+    table = 'SearchIndex'
+    vendor = 'sqlite'
+
+    def index(self, instance: Model) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO "{self.table}" (rowid, text) '
+                'VALUES (%s, %s)',
+                [self.row_id(type(instance), instance.pk), instance.text],
+            )
+
+    def remove(self, instance: Model) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{self.table}" WHERE rowid = %s',
+                [self.row_id(type(instance), instance.pk)],
+            )
+
+    def search(self, query: str, limit: int,
+               after: Optional[Tuple[float, int]] = None) -> List[SearchHit]:
+        query = parse_query(query)
+        if not query:
+            return []
+        sql = (
+            f'SELECT rowid, rank, snippet("{self.table}", 0, %s, %s, '
+            f"'…', %s) FROM \"{self.table}\" WHERE \"{self.table}\" MATCH %s"
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, query]
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [
+            SearchHit(
+                *self.split_row_id(row_id),
+                snippet=highlight(snippet),
+                position=(rank, row_id),
+            )
+            for row_id, rank, snippet in rows
+        ]
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        query = parse_query(query)
+        if not query:
+            return queryset.none()
+        kinds = len(KINDS)
+        return queryset.filter(pk__in=RawSubquery(
+            f'SELECT rowid / {kinds} FROM "{self.table}" '
+            f'WHERE "{self.table}" MATCH %s AND rowid %% {kinds} = %s',
+            [query, KINDS.index(queryset.model)],
+        ))
+
+    def rebuild(self) -> None:
+        kinds = len(KINDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.table}"')
+            for kind, model in enumerate(KINDS):
+                cursor.execute(
+                    f'INSERT INTO "{self.table}" (rowid, text) '
+                    f'SELECT "id" * {kinds} + {kind}, "text" '
+                    f'FROM "{model._meta.db_table}"'
+                )
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> SearchBackend:
+    """Return the backend of ``SEARCH_BACKEND``, or the one without
+    an index if it does not work with the database in use."""
+    backend_class = import_string(settings.SEARCH_BACKEND)
+    if backend_class.vendor not in (None, connection.vendor):
+        backend_class = ContainsSearchBackend
+    return backend_class()
+
+
+def search(query: str, per_page: int,
+           cursor: Optional[str] = None) -> SearchPage:
+    """Return a page of posts and comments matching a query,
+    starting after the result the cursor points at."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        after = None
+    hits = get_backend().search(query, per_page + 1, after)
+    next_cursor = None
+    if len(hits) > per_page:
+        hits = hits[:per_page]
+        next_cursor = encode_cursor(hits[-1].position)
+
+    comments = Comment.objects.select_related(
+        'author', 'post__author', 'post__group',
+    ).in_bulk([hit.pk for hit in hits if hit.model is Comment])
+    posts = Post.objects.for_feed().in_bulk(
+        [hit.pk for hit in hits if hit.model is Post]
+    )
+    results = []
+    for hit in hits:
+        if hit.model is Comment:
+            comment = comments.get(hit.pk)
+            if comment is not None:
+                results.append(
+                    SearchResult(comment.post, comment, hit.snippet)
+                )
+        elif hit.pk in posts:
+            results.append(SearchResult(posts[hit.pk], None, hit.snippet))
+    return SearchPage(results, next_cursor)
@@ -0,0 +1,235 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import timelines
+from .cache import (ALL_POSTS, author_scope, bump_feed_versions,
+                    follows_scope, group_scope)
+from .counters import adjust, adjust_posts_count, adjust_total_posts_count
+from .follows import forget_followed_authors
+from .images import release_image, restore_image
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import get_backend as get_search_backend
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owners(sender, instance, raw, **kwargs):
+    """Store author, group and image a post had before saving,
+    so counters can be moved and the image released if they are changed.
+    """
+    instance._previous_owners = None
+    instance._previous_image = None
+    if instance.pk is not None and not instance._state.adding and not raw:
+        previous = Post.objects.filter(
+            pk=instance.pk,
+        ).values_list('author_id', 'group_id', 'image').first()
+        if previous is not None:
+            instance._previous_owners = previous[:2]
+            instance._previous_image = previous[2]
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_posts_count(instance.author_id, instance.group_id, 1)
+        adjust_total_posts_count(1)
+        if timelines.fanout_enabled():
+            timelines.push_post(instance)
+        return
+
+    previous = getattr(instance, '_previous_owners', None)
+    current = (instance.author_id, instance.group_id)
+    if previous is not None and previous != current:
+        adjust_posts_count(*previous, -1)
+        adjust_posts_count(*current, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    adjust_posts_count(instance.author_id, instance.group_id, -1)
+    adjust_total_posts_count(-1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_image_upload(sender, instance, raw, **kwargs):
+    """Store a newly uploaded image, to restore its file if it is
+    deleted before the post is committed."""
+    instance._image_upload = None
+    if not raw and instance.image and not instance.image._committed:
+        instance._image_upload = instance.image.file
+
+
+@receiver(post_save, sender=Post)
+def restore_uploaded_image(sender, instance, raw, **kwargs):
+    upload = getattr(instance, '_image_upload', None)
+    if upload is not None:
+        restore_image(instance.image.name, upload)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous != instance.image.name:
+        release_image(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_saved_text(sender, instance, raw, **kwargs):
+    if not raw:
+        get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_text(sender, instance, **kwargs):
+    get_search_backend().remove(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        adjust(Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    adjust(Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+
+
+def adjust_follow_counters(follow: Follow, delta: int) -> None:
+    adjust(
+        UserStats.objects.filter(user_id=follow.author_id),
+        'followers_count',
+        delta,
+    )
+    adjust(
+        UserStats.objects.filter(user_id=follow.user_id),
+        'following_count',
+        delta,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        adjust_follow_counters(instance, 1)
+        if timelines.fanout_enabled():
+            timelines.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    adjust_follow_counters(instance, -1)
+    if timelines.fanout_enabled():
+        timelines.prune(instance.user_id, instance.author_id)
+        timelines.restore_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_followed_authors(sender, instance, **kwargs):
+    forget_followed_authors(instance.user_id)
+
+
+def post_scopes(author_id, group_id):
+    """Return feed cache scopes a post is shown in."""
+    scopes = [ALL_POSTS, author_scope(author_id)]
+    if group_id is not None:
+        scopes.append(group_scope(group_id))
+    return scopes
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    scopes = post_scopes(instance.author_id, instance.group_id)
+    previous = getattr(instance, '_previous_owners', None)
+    if previous is not None:
+        scopes += post_scopes(*previous)
+    bump_feed_versions(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    """Comment counters are shown in feeds, so feeds
+    of a commented post are invalidated too."""
+    if Comment.post.is_cached(instance):
+        owners = (instance.post.author_id, instance.post.group_id)
+    else:
+        owners = Post.objects.filter(pk=instance.post_id).values_list(
+            'author_id', 'group_id',
+        ).first()
+    scopes = post_scopes(*owners) if owners is not None else [ALL_POSTS]
+    bump_feed_versions(*scopes)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    """Profile pages of both users show their follow counters."""
+    bump_feed_versions(
+        follows_scope(instance.user_id),
+        author_scope(instance.user_id),
+        author_scope(instance.author_id),
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    """Store authors of the posts of a group before they are detached
+    from it."""
+    instance._author_ids = group_author_ids(instance.pk)
+
+
+def group_author_ids(group_id):
+    return list(Post.objects.filter(group_id=group_id).values_list(
+        'author_id', flat=True,
+    ).distinct())
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    """Group titles are shown in all feeds of the group posts."""
+    author_ids = getattr(instance, '_author_ids', None)
+    if author_ids is None:
+        author_ids = group_author_ids(instance.pk)
+    bump_feed_versions(
+        ALL_POSTS,
+        group_scope(instance.pk),
+        *[author_scope(author_id) for author_id in author_ids],
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_feeds(sender, instance, created=False,
+                            update_fields=None, **kwargs):
+    """Usernames are shown in all feeds of the user's posts."""
+    # New users have no posts, logins do not change profiles.
+    if created or (update_fields is not None
+                   and set(update_fields) <= {'last_login'}):
+        return
+    group_ids = Post.objects.filter(
+        author_id=instance.pk, group__isnull=False,
+    ).values_list('group_id', flat=True).distinct()
+    bump_feed_versions(
+        ALL_POSTS,
+        author_scope(instance.pk),
+        *[group_scope(group_id) for group_id in group_ids],
+    )
@@ -0,0 +1,59 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from yatube.cache import get_or_rebuild
+from yatube.replicas import replica_cache
+
+register = template.Library()
+
+
+class FeedCacheNode(CacheNode):
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"feedcache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}'
+            )
+        if expire_time is not None:
+            expire_time = int(expire_time)
+
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        cache_key, expire_time = replica_cache(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            expire_time,
+        )
+        return get_or_rebuild(
+            cache_key,
+            lambda: self.nodelist.render(context),
+            expire_time,
+        )
+
+
+@register.tag
+def feedcache(parser, token):
+    """Cache a template fragment like the ``cache`` tag,
+    but rebuild it at most once at a time.
+
+    Usage::
+
+        {% feedcache [expire_time] [fragment_name] [var1] [var2] .. %}
+            .. some expensive processing ..
+        {% endfeedcache %}
+    """
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        None,
+    )
@@ -0,0 +1,17 @@
+from django import template
+
+from posts.thumbnails import responsive_image
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """Return the variants of a post image if they have been generated.
+
+    Usage::
+
+        {% post_thumbnail post.image as thumbnail %}
+        <img src="{{ thumbnail.src }}" srcset="{{ thumbnail.srcset }}">
+    """
+    return responsive_image(image)
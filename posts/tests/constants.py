@@ -15,7 +15,8 @@ TEST_IMAGE_BYTES = (
     b'\x00\x00\x01\x00\x01\x00\x00\x02'
     b'\x02\x4c\x01\x00\x3b'
 )
-IMAGE_RE = r'posts/small.*\.gif'
+# Images are stored under the SHA-256 hash of their content.
+IMAGE_RE = r'posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif'
 TEST_IMAGE = SimpleUploadedFile(
     name='small.gif',
     content=TEST_IMAGE_BYTES,
@@ -25,6 +26,7 @@ TEST_IMAGE = SimpleUploadedFile(
 INDEX_URL = reverse('posts:index')
 FOLLOW_INDEX_URL = reverse('posts:follow_index')
 NEW_POST_URL = reverse('posts:new_post')
+SEARCH_URL = reverse('posts:search')
 GROUP_POSTS_URL = reverse('posts:group', kwargs={
     'slug': TEST_GROUP_SLUG,
 })
@@ -47,6 +49,8 @@ LOGIN_URL = reverse('login')
 ERROR_404_URL = reverse('posts:page_not_found')
 ERROR_500_URL = reverse('posts:server_error')
 
+MAX_FEED_QUERIES = 10
+
 POST_MODEL_FIELDS = {
     'text': {
         'verbose_name': 'Текст публикации',
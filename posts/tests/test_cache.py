@@ -0,0 +1,136 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts.cache import ALL_POSTS, author_scope, feed_version
+from posts.checks import check_shared_cache
+from posts.models import Follow, Post
+from posts.tests import constants as _
+from posts.tests.utils import capture_on_commit_callbacks
+from yatube.cache import LOCK_KEY, _lock, get_or_rebuild
+
+User = get_user_model()
+
+THREADS_COUNT = 10
+KEY = 'test:fragment'
+
+
+class GetOrRebuildTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.rebuilds = 0
+        self.rebuilds_lock = threading.Lock()
+
+    def rebuild(self):
+        with self.rebuilds_lock:
+            self.rebuilds += 1
+            rebuild_number = self.rebuilds
+        time.sleep(0.2)
+        return f'value {rebuild_number}'
+
+    def get_concurrently(self):
+        """Запрашивает значение одновременно из нескольких потоков."""
+        barrier = threading.Barrier(THREADS_COUNT)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(get_or_rebuild(KEY, self.rebuild, 60))
+
+        threads = [
+            threading.Thread(target=worker) for _idx in range(THREADS_COUNT)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_is_rebuilt_once(self):
+        """Проверяет, что при пустом кеше значение строится один раз,
+        а остальные потоки дожидаются результата."""
+        results = self.get_concurrently()
+        self.assertEqual(self.rebuilds, 1)
+        self.assertEqual(results, ['value 1'] * THREADS_COUNT)
+
+    def test_stale_value_is_served_while_rebuilding(self):
+        """Проверяет, что устаревшее значение перестраивает один поток,
+        а остальные сразу получают устаревшее значение."""
+        get_or_rebuild(KEY, self.rebuild, 60)
+        with mock.patch('yatube.cache.time.time',
+                        return_value=time.time() + 61):
+            results = self.get_concurrently()
+        self.assertEqual(self.rebuilds, 2)
+        self.assertEqual(results.count('value 2'), 1)
+        self.assertEqual(results.count('value 1'), THREADS_COUNT - 1)
+
+    def test_expired_lock_taken_by_other_is_kept(self):
+        """Проверяет, что перестроение дольше срока блокировки
+        не снимает блокировку, взятую после её истечения другим."""
+        lock_key = LOCK_KEY.format(key=KEY)
+
+        def slow_rebuild():
+            # Блокировка истекла, и её взял другой процесс.
+            cache.delete(lock_key)
+            self.assertIsNotNone(_lock(cache, KEY))
+            return 'value'
+
+        get_or_rebuild(KEY, slow_rebuild, 60)
+        self.assertIsNotNone(cache.get(lock_key))
+
+
+class FeedVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+
+    def test_versions_are_bumped_after_commit(self):
+        """Версии лент меняются только после фиксации транзакции,
+        чтобы параллельный запрос не закешировал старые данные
+        под новой версией."""
+        scopes = (ALL_POSTS, author_scope(self.user.pk))
+        version = feed_version(*scopes)
+        with capture_on_commit_callbacks() as callbacks:
+            Post.objects.create(author=self.user, text='Текст.')
+            Follow.objects.create(
+                author=self.user,
+                user=User.objects.create_user(username='follower'),
+            )
+            self.assertEqual(feed_version(*scopes), version)
+        self.assertEqual(feed_version(*scopes), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(feed_version(*scopes), version)
+
+    def test_rolled_back_changes_do_not_bump_versions(self):
+        """Отменённые изменения не меняют версии лент."""
+        version = feed_version(ALL_POSTS)
+        with capture_on_commit_callbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Post.objects.create(author=self.user, text='Текст.')
+                    raise ValueError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(feed_version(ALL_POSTS), version)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_process_local_cache_is_reported(self):
+        """Проверяет, что локальный для процесса кеш помечается
+        предупреждением при проверке развёртывания."""
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['posts.W001'],
+        )
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        }}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
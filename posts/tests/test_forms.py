@@ -1,11 +1,13 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image as PILImage
 
 from posts.forms import CommentForm, PostForm
 from posts.models import Group, Post
@@ -80,9 +82,9 @@ class PostFormTests(TestCase):
         form_data = {
             'text': 'Измененный текст',
             'image': SimpleUploadedFile(
-                name='second_small.gif',
-                content=_.TEST_IMAGE_BYTES,
-                content_type='image/gif',
+                name='second_small.png',
+                content=self.image_bytes((2, 2), 'PNG'),
+                content_type='image/png',
             ),
         }
 
@@ -97,10 +99,56 @@ class PostFormTests(TestCase):
         self.assertTrue(
             Post.objects.filter(
                 text='Измененный текст',
-                image__regex=r'second_small.*\.gif',
+                image__regex=r'posts/[0-9a-f/]+\.png',
             ).exists()
         )
 
+    @staticmethod
+    def image_bytes(size, format_):
+        content = BytesIO()
+        PILImage.new('RGB', size).save(content, format_)
+        return content.getvalue()
+
+    def upload_image(self, size, format_='JPEG', name='large.jpg'):
+        return self.authorized_client.post(_.NEW_POST_URL, data={
+            'text': 'Тестовый текст',
+            'image': SimpleUploadedFile(name, self.image_bytes(size, format_)),
+        })
+
+    @override_settings(UPLOAD_MAX_BYTES=1024)
+    def test_too_large_file(self):
+        """Файл больше UPLOAD_MAX_BYTES не сохраняется."""
+        response = self.upload_image((500, 500), 'BMP', 'large.bmp')
+
+        self.assertFormError(
+            response, 'form', 'image',
+            'Размер файла не должен превышать 1,0\xa0КБ.',
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=1000 * 1000)
+    def test_too_many_pixels(self):
+        """Изображение больше IMAGE_MAX_PIXELS не сохраняется."""
+        response = self.upload_image((1001, 1000))
+
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение не должно быть больше 1 мегапикселей.',
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_downscale_large_image(self):
+        """Изображение со стороной больше IMAGE_MAX_SIDE уменьшается
+        с сохранением пропорций."""
+        self.upload_image((400, 200))
+
+        post = Post.objects.get()
+        self.assertEqual(
+            (post.image.width, post.image.height), (100, 50)
+        )
+        self.assertTrue(post.image.name.endswith('.jpg'))
+
     def test_fields(self):
         form = PostForm()
 
@@ -1,7 +1,28 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-from posts.models import Comment, Follow, Group, Post, User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts.counters import total_posts_count
+from posts.follows import FollowedFeed
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from posts.paginator import KeysetPaginator, beyond, union_sql
+from posts.search import get_backend as get_search_backend
+from posts.timelines import TimelineFeed
 from posts.tests import constants as _
+from yatube.sqlite3.base import DatabaseWrapper
+from yatube.storage import ContentAddressedStorage
 from yatube.utils import wrap_text
 
 
@@ -113,3 +134,438 @@ class FollowModelTest(TestCase):
             user=user,
         )
         self.assertEqual(str(follow), expected_output)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username=_.TEST_USERNAME)
+        self.group = Group.objects.create(
+            title=_.TEST_GROUP_TITLE,
+            slug=_.TEST_GROUP_SLUG,
+        )
+        self.second_group = Group.objects.create(
+            title=_.SECOND_TEST_GROUP_TITLE,
+            slug=_.SECOND_TEST_GROUP_SLUG,
+        )
+
+    def assertPostsCounts(self, user_count, group_count, second_group_count):
+        self.user.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.second_group.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, user_count)
+        self.assertEqual(self.group.posts_count, group_count)
+        self.assertEqual(self.second_group.posts_count, second_group_count)
+
+    def test_posts_counters(self):
+        """Проверяет, что счётчики публикаций обновляются при создании,
+        переносе в другую группу и удалении поста."""
+        post = Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='Текст.',
+        )
+        self.assertPostsCounts(1, 1, 0)
+        self.assertEqual(total_posts_count(), 1)
+
+        post.group = self.second_group
+        post.save()
+        self.assertPostsCounts(1, 0, 1)
+
+        post.delete()
+        self.assertPostsCounts(0, 0, 0)
+        self.assertEqual(total_posts_count(), 0)
+
+    def test_rebuild_counters(self):
+        """Проверяет пересчёт счётчиков после массовой вставки."""
+        Post.objects.bulk_create([
+            Post(author=self.user, group=self.group, text='Текст.')
+            for _idx in range(3)
+        ])
+        self.assertPostsCounts(0, 0, 0)
+
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertPostsCounts(3, 3, 0)
+        self.assertEqual(total_posts_count(), 3)
+
+    def test_comments_counter(self):
+        """Проверяет, что счётчик комментариев обновляется при создании
+        и удалении комментариев, в том числе каскадном."""
+        commentator = User.objects.create(username=_.SECOND_TEST_USERNAME)
+        post = Post.objects.create(author=self.user, text='Текст.')
+        stale_post = Post.objects.get(pk=post.pk)
+
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий.',
+        )
+        Comment.objects.create(
+            post=post, author=commentator, text='Комментарий.',
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+        stale_post.text = 'Новый текст.'
+        stale_post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+        comment.delete()
+        commentator.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Проверяет счётчики подписчиков и подписок."""
+        author = User.objects.create(username=_.SECOND_TEST_USERNAME)
+        Follow.objects.create(author=author, user=self.user)
+        Follow.objects.create(author=self.user, user=self.user)
+
+        author.stats.refresh_from_db()
+        self.user.stats.refresh_from_db()
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(self.user.stats.following_count, 1)
+        self.assertEqual(self.user.stats.followers_count, 0)
+
+        Follow.objects.filter(author=author, user=self.user).delete()
+        author.stats.refresh_from_db()
+        self.user.stats.refresh_from_db()
+        self.assertEqual(author.stats.followers_count, 0)
+        self.assertEqual(self.user.stats.following_count, 0)
+
+        UserStats.objects.update(followers_count=7, following_count=7)
+        call_command('rebuild_counters', stdout=StringIO())
+        author.stats.refresh_from_db()
+        self.assertEqual(author.stats.followers_count, 0)
+        self.assertEqual(author.stats.following_count, 0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ImageStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create(username=_.TEST_USERNAME)
+        # Файлы удаляются после фиксации транзакции,
+        # а в TestCase она не фиксируется.
+        patcher = mock.patch(
+            'posts.images.transaction.on_commit', lambda func: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Текст.',
+            image=SimpleUploadedFile(name, _.TEST_IMAGE_BYTES),
+        )
+
+    def test_identical_images_are_stored_once(self):
+        """Одинаковые изображения хранятся в одном файле."""
+        first = self.create_post('small.gif')
+        second = self.create_post('copy.gif')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, _.IMAGE_RE)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_shared_image_is_deleted_with_last_post(self):
+        """Общий файл удаляется только вместе с последним постом,
+        который на него ссылается."""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_image_deleted_while_saving_is_written_again(self):
+        """Файл, удалённый вместе с последним постом, пока сохранялся
+        новый пост с тем же изображением, записывается заново."""
+        first = self.create_post()
+        path = first.image.path
+        save = ContentAddressedStorage._save
+
+        def save_and_delete_first(storage, name, content):
+            name = save(storage, name, content)
+            first.delete()
+            self.assertFalse(os.path.exists(path))
+            return name
+
+        with mock.patch.object(
+            ContentAddressedStorage, '_save', save_and_delete_first,
+        ):
+            second = self.create_post()
+
+        self.assertEqual(second.image.path, path)
+        with open(path, 'rb') as image:
+            self.assertEqual(image.read(), _.TEST_IMAGE_BYTES)
+
+    def test_replaced_image_is_deleted(self):
+        """Заменённое изображение удаляется, если больше не используется."""
+        post = self.create_post()
+        path = post.image.path
+
+        post.image = None
+        post.save()
+
+        self.assertFalse(os.path.exists(path))
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_superuser(
+            username=_.TEST_USERNAME, email='author@example.com',
+            password='password',
+        )
+        self.reader = User.objects.create_user(
+            username=_.SECOND_TEST_USERNAME,
+        )
+        self.group = Group.objects.create(
+            title=_.TEST_GROUP_TITLE, slug=_.TEST_GROUP_SLUG,
+        )
+        self.date = datetime(
+            2020, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc,
+        )
+        posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Кот {number}.',
+            )
+            for number in range(3)
+        ]
+        Post.objects.update(pub_date=self.date)
+        Comment.objects.create(author=self.reader, post=posts[0], text='Да.')
+        Comment.objects.update(created=self.date)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_export_import(self):
+        """Выгрузка и загрузка сохраняют данные, первичные ключи и даты,
+        пароли и права пользователей, а счётчики и поисковый индекс
+        строятся заново."""
+        dump = StringIO()
+        call_command('export_yatube', '-', stdout=dump, stderr=StringIO())
+        expected = {
+            model: list(model.objects.order_by('pk').values())
+            for model in (Group, Post, Comment, Follow)
+        }
+        user_fields = ('pk', 'password', 'is_staff', 'is_superuser')
+        users = list(User.objects.order_by('pk').values(*user_fields))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        with mock.patch('sys.stdin', StringIO(dump.getvalue())):
+            call_command(
+                'import_yatube', '-', batch_size=2, stdout=StringIO(),
+            )
+
+        for model, rows in expected.items():
+            with self.subTest(model=model.__name__):
+                self.assertEqual(
+                    list(model.objects.order_by('pk').values()), rows
+                )
+        self.assertEqual(
+            list(User.objects.order_by('pk').values(*user_fields)), users,
+        )
+        self.assertFalse(Post.objects.exclude(pub_date=self.date).exists())
+        self.assertFalse(Comment.objects.exclude(created=self.date).exists())
+        self.assertTrue(self.client.login(
+            username=_.TEST_USERNAME, password='password',
+        ))
+        self.assertFalse(User.objects.get(
+            username=_.SECOND_TEST_USERNAME,
+        ).has_usable_password())
+        author = User.objects.get(username=_.TEST_USERNAME)
+        self.assertEqual(author.stats.posts_count, 3)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(
+            Group.objects.get().posts_count, 3
+        )
+        self.assertEqual(
+            get_search_backend().filter(Post.objects.all(), 'кот').count(), 3
+        )
+
+
+class GenerateDatasetTest(TestCase):
+    OPTIONS = {
+        'users': 30, 'groups': 3, 'posts': 200, 'comments': 100,
+        'follows': 5, 'batch_size': 64,
+    }
+
+    def generate(self, seed):
+        call_command(
+            'generate_dataset', seed=seed, stdout=StringIO(), **self.OPTIONS
+        )
+        return {
+            model: list(model.objects.order_by('pk').values())
+            for model in (Group, Post, Comment, Follow)
+        }
+
+    def test_dataset_is_reproducible(self):
+        """Одинаковый seed даёт одинаковые данные, другой — другие."""
+        first = self.generate(seed=1)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        self.assertEqual(self.generate(seed=1), first)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertNotEqual(self.generate(seed=2), first)
+
+    def test_dataset_counts(self):
+        """Создаётся заданное число строк, счётчики пересчитываются,
+        а самый активный автор пишет заметно больше среднего."""
+        self.generate(seed=1)
+
+        self.assertEqual(User.objects.count(), self.OPTIONS['users'])
+        self.assertEqual(Post.objects.count(), self.OPTIONS['posts'])
+        self.assertEqual(Comment.objects.count(), self.OPTIONS['comments'])
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        top = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(top.posts_count, top.user.posts.count())
+        self.assertGreater(
+            top.posts_count,
+            3 * self.OPTIONS['posts'] / self.OPTIONS['users'],
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов SQLite.')
+class FeedIndexesTest(TestCase):
+    def assertIndexOrdered(self, queryset, index):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {index}\b')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_are_read_from_indexes_in_order(self):
+        """Ленты и комментарии читаются из составных индексов
+        без отдельной сортировки."""
+        posts = Post.objects.for_feed().order_by(*KeysetPaginator.ordering)
+        paginator = KeysetPaginator(posts.filter(author_id=1), 10)
+        cases = (
+            (posts, 'post_pub_date_id_idx'),
+            (posts.filter(group_id=1), 'post_group_pub_date_id_idx'),
+            (posts.filter(author_id=1), 'post_author_pub_date_id_idx'),
+            (paginator._after(datetime.now(timezone.utc), 1),
+             'post_author_pub_date_id_idx'),
+            (Comment.objects.filter(post_id=1).select_related('author'),
+             'comment_post_created_idx'),
+        )
+        for queryset, index in cases:
+            with self.subTest(index=index):
+                self.assertIndexOrdered(queryset[:10], index)
+
+    def explain(self, feed, **keys):
+        sql, params = union_sql(feed.parts(10, **keys), 10, True)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def test_follow_feeds_are_read_from_indexes(self):
+        """Ленты подписок в обоих режимах читают записи каждого автора
+        из индекса автора одним запросом, а не просматривают
+        все записи."""
+        user = User.objects.create(username=_.TEST_USERNAME)
+        authors = []
+        for idx in range(2):
+            author = User.objects.create(username=f'author_{idx}')
+            Follow.objects.create(user=user, author=author)
+            authors.append(author.pk)
+        timeline = TimelineFeed(user)
+        timeline.celebrities = authors
+        key = (datetime.now(timezone.utc), 1)
+        for feed in (FollowedFeed(user), timeline):
+            for keys in ({}, {'after': key}, {'before': key}):
+                with self.subTest(feed=feed, keys=keys):
+                    plan = self.explain(feed, **keys)
+                    self.assertEqual(plan.count(
+                        'USING COVERING INDEX post_author_pub_date_id_idx'
+                    ), len(authors))
+                    self.assertNotIn('post_pub_date_id_idx', plan)
+
+    def test_timeline_is_read_from_index_in_order(self):
+        """Таймлайн читается из индекса без отдельной сортировки."""
+        user = User.objects.create(username=_.TEST_USERNAME)
+        feed = TimelineFeed(user)
+        feed.celebrities = [1]
+        [(timeline, pk_field)] = feed.sources()
+        key = (datetime.now(timezone.utc), 1)
+        for queryset in (
+            timeline,
+            timeline.filter(beyond(key, pk_field, 'lt')),
+            timeline.filter(beyond(key, pk_field, 'gt')).reverse(),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                self.assertIndexOrdered(
+                    queryset[:10], 'timeline_user_date_post_idx',
+                )
+
+    def test_followers_are_read_from_index(self):
+        """Подписчики автора находятся по индексу (author, user)."""
+        self.assertIn(
+            'USING COVERING INDEX follow_author_user_idx',
+            Follow.objects.filter(author_id=1).values('user_id').explain(),
+        )
+
+
+class SQLiteBackendTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def connect(self, **options):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': 0.01,
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+                **options,
+            },
+        })
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def fetch(self, wrapper, sql):
+        with wrapper.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_set_on_connect(self):
+        """Прагмы из настроек применяются к каждому соединению."""
+        wrapper = self.connect()
+        self.assertEqual(self.fetch(wrapper, 'PRAGMA journal_mode'), 'wal')
+        synchronous = self.fetch(wrapper, 'PRAGMA synchronous')
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+    def test_writers_take_lock_on_begin_and_readers_do_not_wait(self):
+        """Пишущая транзакция берёт блокировку в начале, читатели
+        не ждут писателя."""
+        writer = self.connect()
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE "Items" ("id" integer)')
+        writer._start_transaction_under_autocommit()
+        with writer.cursor() as cursor:
+            cursor.execute('INSERT INTO "Items" VALUES (1)')
+
+        other = self.connect()
+        self.assertEqual(self.fetch(other, 'SELECT count(*) FROM "Items"'), 0)
+        with self.assertRaisesMessage(OperationalError, 'locked'):
+            other._start_transaction_under_autocommit()
+
+    def test_unknown_transaction_mode(self):
+        """Неизвестный режим транзакций отклоняется."""
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect(transaction_mode='LAZY')
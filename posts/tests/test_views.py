@@ -1,18 +1,54 @@
+import asyncio
+import contextvars
+import json
+import logging.config
+import os
 import re
 import shutil
+import sqlite3
 import tempfile
+import threading
+from concurrent.futures import Future
+from copy import deepcopy
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
 from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.core.paginator import Paginator
-from django.test import Client, TestCase, override_settings
+from django.core.signals import request_finished
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image as PILImage
 
+from posts.counters import rebuild_posts_counters
+from posts.follows import is_following
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post
+from posts.models import Comment, Follow, Group, Post, UserStats
+from posts.paginator import encode_cursor
+from posts.search import ContainsSearchBackend, SQLiteSearchBackend
+from posts.search import get_backend as get_search_backend
 from posts.tests import constants as _
+from posts.tests.utils import capture_on_commit_callbacks
+from posts.thumbnails import (
+    POST_IMAGE_WIDTHS, cached_thumbnail, generate_thumbnails,
+    schedule_thumbnails,
+)
+from yatube.asgi import ConcurrentWsgiToAsgi
+from yatube.asgi import application as asgi_application
+from yatube.metrics import collect, install
+from yatube.replicas import (PIN_COOKIE, ReplicaMiddleware, ReplicaRouter,
+                             replica_cache, replica_reads)
 from yatube.settings import POSTS_PER_PAGE
+from yatube.utils import show_toolbar
 
 User = get_user_model()
 
@@ -113,6 +149,8 @@ class IndexGroupViewsTests(TestCase):
                 )
 
     def test_cache(self):
+        """Проверяет, что фрагменты лент кешируются и сбрасываются
+        сразу при изменении постов."""
         client = self.second_authorized_client
 
         urls = (
@@ -122,9 +160,11 @@ class IndexGroupViewsTests(TestCase):
         )
 
         initial_pages = [client.get(url) for url in urls]
-        Post.objects.all().delete()
+        # update() не отправляет сигналы, поэтому кеш не сбрасывается.
+        Post.objects.update(text='Измененный текст.')
         cached_pages = [client.get(url) for url in urls]
-        cache.clear()
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.all().delete()
         pages = [client.get(url) for url in urls]
 
         for idx, url in enumerate(urls):
@@ -136,6 +176,34 @@ class IndexGroupViewsTests(TestCase):
                     initial_pages[idx].content, pages[idx].content
                 )
 
+    def test_cache_is_invalidated_by_comments_and_follows(self):
+        """Проверяет сброс кеша лент при комментировании и подписке."""
+        client = self.second_authorized_client
+        urls = (
+            _.INDEX_URL,
+            _.GROUP_POSTS_URL,
+        )
+
+        initial_pages = [client.get(url).content for url in urls]
+        with capture_on_commit_callbacks(execute=True):
+            Comment.objects.create(
+                post=self.post,
+                author=self.second_user,
+                text='Комментарий.',
+            )
+        for url, initial_page in zip(urls, initial_pages):
+            with self.subTest(url=url):
+                self.assertNotEqual(client.get(url).content, initial_page)
+
+        self.assertContains(
+            client.get(_.FOLLOW_INDEX_URL), self.post_values['text']
+        )
+        with capture_on_commit_callbacks(execute=True):
+            Follow.objects.filter(user=self.second_user).delete()
+        self.assertNotContains(
+            client.get(_.FOLLOW_INDEX_URL), self.post_values['text']
+        )
+
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
 class NewEditPostViewsTests(TestCase):
@@ -235,6 +303,32 @@ class ProfilePostViewsTests(TestCase):
             re.fullmatch(_.IMAGE_RE, actual_post_data['image'].name)
         )
 
+    def test_profile_without_stats(self):
+        """Проверяет, что профиль пользователя без счётчиков,
+        загруженного через loaddata, открывается и счётчики создаются."""
+        Follow.objects.create(author=self.user, user=self.second_user)
+        UserStats.objects.filter(user=self.user).delete()
+
+        response = self.guest_client.get(_.USER_PROFILE_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 1)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(stats.following_count, 0)
+
+    def test_post_page_without_stats(self):
+        """Проверяет, что на странице поста автора без счётчиков
+        карточка профиля показывает пересчитанные счётчики."""
+        UserStats.objects.filter(user=self.user).delete()
+
+        response = self.guest_client.get(self.POST_PAGE_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Записей: 1')
+        self.assertTrue(UserStats.objects.filter(user=self.user).exists())
+
     def test_post_page_correct_context(self):
         """Проверяет правильность контекста на странице отдельного поста."""
         expected_context = {
@@ -286,6 +380,9 @@ class PaginatorViewsTests(TestCase):
 
         posts = [Post(**post_content) for post_content in self.posts_content]
         Post.objects.bulk_create(posts)
+        # bulk_create не отправляет сигналы, поэтому счётчики
+        # публикаций пересчитываются вручную.
+        rebuild_posts_counters()
         self.posts_content = reversed(self.posts_content)
 
         self.guest_client = Client()
@@ -338,3 +435,1079 @@ class PaginatorViewsTests(TestCase):
                                     actual_content[value],
                                     expected_content[value],
                                 )
+
+    def test_cursor_pages_match_numbered_pages(self):
+        """Проверяет, что переход по курсору отдаёт те же посты,
+        что и переход по номеру страницы."""
+        urls = [
+            _.INDEX_URL,
+            _.GROUP_POSTS_URL,
+        ]
+
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                first_page = self.guest_client.get(url).context['page']
+                second_page = self.guest_client.get(
+                    url + '?page=2'
+                ).context['page']
+
+                cache.clear()
+                next_page = self.guest_client.get(
+                    url + f'?page=2&after={first_page.next_cursor}'
+                ).context['page']
+                self.assertEqual(
+                    list(next_page.object_list),
+                    list(second_page.object_list),
+                )
+
+                cache.clear()
+                previous_page = self.guest_client.get(
+                    url + f'?page=1&before={next_page.previous_cursor}'
+                ).context['page']
+                self.assertEqual(
+                    list(previous_page.object_list),
+                    list(first_page.object_list),
+                )
+
+    def test_broken_cursor_falls_back_to_page_number(self):
+        """Проверяет, что некорректный курсор не ломает пагинацию."""
+        response = self.guest_client.get(
+            _.INDEX_URL + '?page=2&after=broken'
+        )
+        page = response.context['page']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page.object_list), 5)
+
+    def test_cursor_does_not_poison_cached_page(self):
+        """Страница, запрошенная с чужим курсором, не попадает в кэш
+        страницы с тем же номером."""
+        newest = Post.objects.order_by('-pub_date', '-id').first()
+        for url in (_.INDEX_URL, _.GROUP_POSTS_URL):
+            with self.subTest(url=url):
+                cache.clear()
+                self.guest_client.get(
+                    url, {'page': 1, 'after': encode_cursor(newest)},
+                )
+                response = self.guest_client.get(url)
+                self.assertContains(response, newest.text)
+
+
+class FeedQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+        self.follower = User.objects.create_user(
+            username=_.SECOND_TEST_USERNAME
+        )
+        Follow.objects.create(author=self.user, user=self.follower)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+
+        self.group = Group.objects.create(
+            title=_.TEST_GROUP_TITLE,
+            slug=_.TEST_GROUP_SLUG,
+        )
+        for idx in range(POSTS_PER_PAGE + 1):
+            post = Post.objects.create(
+                text=f'Текст поста {idx}.',
+                author=self.user,
+                group=self.group,
+            )
+            Comment.objects.create(
+                post=post,
+                author=self.follower,
+                text='Комментарий.',
+            )
+
+    def test_feed_queries_upper_bound(self):
+        """Проверяет, что число запросов к БД на странице ленты
+        не зависит от числа постов на ней."""
+        urls = (
+            _.INDEX_URL,
+            _.GROUP_POSTS_URL,
+            _.USER_PROFILE_URL,
+            _.FOLLOW_INDEX_URL,
+        )
+
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(
+                    len(response.context['page']), POSTS_PER_PAGE
+                )
+                self.assertLessEqual(len(queries), _.MAX_FEED_QUERIES)
+
+    def test_follow_feed_queries_do_not_grow_with_subscriptions(self):
+        """Проверяет, что число запросов ленты подписок не зависит
+        от числа авторов, на которых подписан пользователь."""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(_.FOLLOW_INDEX_URL)
+        expected_count = len(queries)
+
+        for idx in range(5):
+            author = User.objects.create_user(username=f'author_{idx}')
+            Post.objects.create(author=author, text='Текст.')
+            Follow.objects.create(author=author, user=self.follower)
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(_.FOLLOW_INDEX_URL)
+        self.assertEqual(len(queries), expected_count)
+
+
+class IsFollowingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username=_.TEST_USERNAME)
+        self.user = User.objects.create_user(
+            username=_.SECOND_TEST_USERNAME
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertIsFollowing(self, expected):
+        response = self.authorized_client.get(_.USER_PROFILE_URL)
+        self.assertIs(response.context['is_following'], expected)
+
+    def test_is_following_follows_subscriptions(self):
+        """Проверяет, что признак подписки в контексте профиля
+        обновляется сразу после подписки и отписки."""
+        self.assertIsFollowing(False)
+        self.authorized_client.get(_.USER_FOLLOW_URL)
+        self.assertIsFollowing(True)
+        self.authorized_client.get(_.USER_UNFOLLOW_URL)
+        self.assertIsFollowing(False)
+
+    def test_is_following_is_cached(self):
+        """Проверяет, что повторная проверка подписки
+        не обращается к таблице подписок."""
+        Follow.objects.create(author=self.author, user=self.user)
+        self.assertTrue(is_following(self.user, self.author))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(self.user, self.author))
+
+    @override_settings(FOLLOWED_AUTHORS_CACHE_LIMIT=0)
+    def test_is_following_for_many_subscriptions(self):
+        """Проверяет проверку подписки запросом EXISTS,
+        если подписок слишком много для кеша."""
+        Follow.objects.create(author=self.author, user=self.user)
+        self.assertTrue(is_following(self.user, self.author))
+        with self.assertNumQueries(1):
+            self.assertTrue(is_following(self.user, self.author))
+
+
+@override_settings(FOLLOW_FEED_MODE='write')
+class TimelineFollowFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username=_.TEST_USERNAME)
+        self.user = User.objects.create_user(
+            username=_.SECOND_TEST_USERNAME
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_page(self, **params):
+        cache.clear()
+        response = self.authorized_client.get(_.FOLLOW_INDEX_URL, params)
+        return response.context['page']
+
+    def get_feed(self):
+        return list(self.get_page())
+
+    def test_posts_are_pushed_to_followers(self):
+        """Проверяет, что новые посты попадают в ленту подписчиков,
+        а подписка и отписка дополняют и очищают ленту."""
+        old_post = Post.objects.create(author=self.author, text='Старый.')
+        self.authorized_client.get(_.USER_FOLLOW_URL)
+        self.assertEqual(self.get_feed(), [old_post])
+
+        new_post = Post.objects.create(author=self.author, text='Новый.')
+        self.assertEqual(self.get_feed(), [new_post, old_post])
+        self.assertEqual(self.user.timeline.count(), 2)
+
+        self.authorized_client.get(_.USER_UNFOLLOW_URL)
+        self.assertEqual(self.get_feed(), [])
+        self.assertFalse(self.user.timeline.exists())
+
+    @override_settings(TIMELINE_MAX_LENGTH=2, TIMELINE_TRIM_INTERVAL=1)
+    def test_timeline_is_bounded(self):
+        """Проверяет, что в ленте хранятся только новейшие записи."""
+        Follow.objects.create(author=self.author, user=self.user)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Текст {idx}.')
+            for idx in range(3)
+        ]
+        self.assertEqual(self.get_feed(), posts[:0:-1])
+
+    @override_settings(FANOUT_MAX_FOLLOWERS=0)
+    def test_celebrity_posts_are_read_on_request(self):
+        """Проверяет, что посты авторов с большим числом подписчиков
+        не копируются в ленты, но видны в ленте подписок."""
+        Follow.objects.create(author=self.author, user=self.user)
+        post = Post.objects.create(author=self.author, text='Текст.')
+        self.assertFalse(self.user.timeline.exists())
+        self.assertEqual(self.get_feed(), [post])
+
+    @override_settings(TIMELINE_MAX_LENGTH=3, TIMELINE_TRIM_INTERVAL=2)
+    def test_timeline_is_trimmed_once_in_interval(self):
+        """Проверяет, что ленты подписчиков обрезаются после каждой
+        TIMELINE_TRIM_INTERVAL-й записи автора."""
+        Follow.objects.create(author=self.author, user=self.user)
+        for idx in range(4):
+            Post.objects.create(author=self.author, text=f'Текст {idx}.')
+        self.assertEqual(self.user.timeline.count(), 3)
+        Post.objects.create(author=self.author, text='Текст 4.')
+        self.assertEqual(self.user.timeline.count(), 4)
+
+    def test_celebrity_posts_are_merged_with_timeline(self):
+        """Проверяет, что посты знаменитостей и посты из ленты идут
+        вместе по дате без повторов на страницах по номеру и курсору."""
+        celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(author=self.author, user=self.user)
+        Follow.objects.create(author=celebrity, user=self.user)
+        posts = [
+            Post.objects.create(
+                author=(self.author, celebrity)[idx % 2],
+                text=f'Текст {idx}.',
+            )
+            for idx in range(POSTS_PER_PAGE + 3)
+        ]
+        expected = posts[::-1]
+
+        # Записи, попавшие в ленту до того, как автор стал знаменитостью,
+        # не повторяются.
+        with self.settings(FANOUT_MAX_FOLLOWERS=0):
+            UserStats.objects.filter(user=celebrity).update(
+                followers_count=1,
+            )
+            first = self.get_page()
+            self.assertEqual(list(first), expected[:POSTS_PER_PAGE])
+            self.assertEqual(first.paginator.count, len(posts))
+            self.assertEqual(
+                list(self.get_page(page=2)), expected[POSTS_PER_PAGE:],
+            )
+            second = self.get_page(page=2, after=first.next_cursor)
+            self.assertEqual(list(second), expected[POSTS_PER_PAGE:])
+            self.assertEqual(
+                list(self.get_page(page=1, before=second.previous_cursor)),
+                expected[:POSTS_PER_PAGE],
+            )
+
+    def test_posts_are_restored_when_author_is_not_celebrity(self):
+        """Проверяет, что записи, сделанные автором, пока у него было
+        слишком много подписчиков, попадают в ленты после отписки."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(author=self.author, user=self.user)
+        Follow.objects.create(author=self.author, user=reader)
+        with self.settings(FANOUT_MAX_FOLLOWERS=1):
+            post = Post.objects.create(author=self.author, text='Текст.')
+            self.assertFalse(self.user.timeline.exists())
+            Follow.objects.filter(author=self.author, user=reader).delete()
+        self.assertEqual(
+            list(self.user.timeline.values_list('post', flat=True)),
+            [post.pk],
+        )
+
+
+class PostEndpointsQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.post = Post.objects.create(author=self.user, text='Текст.')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий.',
+        )
+
+        kwargs = {
+            'username': _.TEST_USERNAME,
+            'post_id': self.post.id,
+        }
+        self.POST_PAGE_URL = reverse('posts:post', kwargs=kwargs)
+        self.POST_EDIT_URL = reverse('posts:post_edit', kwargs=kwargs)
+        self.ADD_COMMENT_URL = reverse('posts:add_comment', kwargs=kwargs)
+
+    def test_post_endpoints_queries(self):
+        """Проверяет число запросов к БД на страницах поста:
+        пост загружается вместе с автором одним запросом."""
+        # Сессия и пользователь, пост с автором, комментарии.
+        with self.assertNumQueries(4):
+            self.authorized_client.get(self.POST_PAGE_URL)
+        # Сессия и пользователь, пост с автором, группы для формы.
+        with self.assertNumQueries(4):
+            self.authorized_client.get(self.POST_EDIT_URL)
+
+    def test_add_comment_queries(self):
+        """Проверяет число запросов при добавлении комментария."""
+        # Сессия и пользователь, пост с автором, вставка комментария,
+        # обновление счётчика комментариев и поискового индекса.
+        with self.assertNumQueries(6):
+            self.authorized_client.post(
+                self.ADD_COMMENT_URL, data={'text': 'Комментарий.'},
+            )
+
+    def test_wrong_username_redirects_to_author_url(self):
+        """Проверяет переадресацию с адреса поста с чужим именем
+        пользователя на адрес с именем автора."""
+        User.objects.create_user(username=_.SECOND_TEST_USERNAME)
+        url = reverse('posts:post', kwargs={
+            'username': _.SECOND_TEST_USERNAME,
+            'post_id': self.post.id,
+        })
+        response = self.authorized_client.get(url)
+        self.assertRedirects(response, self.POST_PAGE_URL)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+    THUMBNAIL_WORKERS=0,
+)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_original_is_shown_until_thumbnail_is_ready(self):
+        """Проверяет, что страница не создаёт миниатюру сама,
+        а показывает оригинал, пока миниатюра не готова."""
+        post = Post.objects.create(
+            author=self.user, text='Текст.', image=_.TEST_IMAGE,
+        )
+        response = self.authorized_client.get(_.INDEX_URL)
+        self.assertContains(response, post.image.url)
+        self.assertIsNone(cached_thumbnail(post.image))
+
+        call_command('warm_thumbnails', workers=0, stdout=StringIO())
+        thumbnail = cached_thumbnail(post.image)
+        self.assertIsNotNone(thumbnail)
+
+        cache.clear()
+        response = self.authorized_client.get(_.INDEX_URL)
+        self.assertContains(response, thumbnail.url)
+
+    def test_form_save_generates_thumbnail(self):
+        """Проверяет, что сохранение формы с изображением
+        запускает создание миниатюры."""
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit', lambda func: func()
+        ):
+            self.authorized_client.post(_.NEW_POST_URL, data={
+                'text': 'Текст.',
+                'image': SimpleUploadedFile(
+                    name='small.gif',
+                    content=_.TEST_IMAGE_BYTES,
+                    content_type='image/gif',
+                ),
+            })
+        post = Post.objects.get()
+        self.assertIsNotNone(cached_thumbnail(post.image))
+
+    def test_saved_post_without_thumbnail_schedules_it(self):
+        """Проверяет, что миниатюры создаются и для изображения,
+        переиспользованного при загрузке того же содержимого,
+        и при любом сохранении записи с изображением без миниатюр."""
+        first = Post.objects.create(
+            author=self.user, text='Текст.', image=_.TEST_IMAGE,
+        )
+        self.assertIsNone(cached_thumbnail(first.image))
+
+        with capture_on_commit_callbacks(execute=True):
+            second = Post.objects.create(
+                author=self.user, text='Текст.', image=_.TEST_IMAGE,
+            )
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertIsNotNone(cached_thumbnail(first.image))
+
+        generate = mock.Mock()
+        with capture_on_commit_callbacks(execute=True), mock.patch(
+            'posts.thumbnails.generate_thumbnails', generate,
+        ):
+            first.save()
+        generate.assert_not_called()
+
+    def test_cached_feeds_show_generated_thumbnail(self):
+        """Проверяет, что закешированные ленты показывают миниатюру
+        после её создания, а не оригинал."""
+        post = Post.objects.create(
+            author=self.user, text='Текст.', image=_.TEST_IMAGE,
+        )
+        profile_url = reverse('posts:profile', kwargs={
+            'username': _.TEST_USERNAME,
+        })
+        urls = (_.INDEX_URL, profile_url)
+        for url in urls:
+            self.authorized_client.get(url)
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit', lambda func: func()
+        ):
+            schedule_thumbnails(post.image)
+
+        thumbnail = cached_thumbnail(post.image)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, thumbnail.url)
+
+    def test_worker_thumbnail_invalidates_feeds(self):
+        """Проверяет, что миниатюра, созданная в рабочем процессе,
+        сбрасывает кеш лент поста."""
+        post = Post.objects.create(
+            author=self.user, text='Текст.', image=_.TEST_IMAGE,
+        )
+        self.authorized_client.get(_.INDEX_URL)
+        future = Future()
+        executor = mock.Mock(**{'submit.return_value': future})
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit', lambda func: func()
+        ), mock.patch(
+            'posts.thumbnails.get_executor', return_value=executor
+        ), self.settings(THUMBNAIL_WORKERS=2):
+            schedule_thumbnails(post.image)
+        generate_thumbnails(post.image.name)
+        with capture_on_commit_callbacks(execute=True):
+            future.set_result(None)
+
+        response = self.authorized_client.get(_.INDEX_URL)
+        self.assertContains(response, cached_thumbnail(post.image).url)
+
+    def test_responsive_variants(self):
+        """Проверяет, что для изображения создаются варианты всех ширин
+        в исходном формате и в WebP и выводятся в srcset."""
+        content = BytesIO()
+        PILImage.new('RGB', (2000, 800)).save(content, 'JPEG')
+        post = Post.objects.create(
+            author=self.user,
+            text='Текст.',
+            image=SimpleUploadedFile('large.jpg', content.getvalue()),
+        )
+        generate_thumbnails(post.image.name)
+
+        response = self.authorized_client.get(_.INDEX_URL)
+        for width in POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                jpeg = cached_thumbnail(post.image, width)
+                webp = cached_thumbnail(post.image, width, 'WEBP')
+                self.assertEqual(jpeg.width, width)
+                self.assertTrue(webp.name.endswith('.webp'))
+                self.assertContains(response, f'{jpeg.url} {width}w')
+                self.assertContains(response, f'{webp.url} {width}w')
+        self.assertContains(response, 'type="image/webp"')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(_.SEARCH_URL, {'q': query, **params})
+
+    def test_search_posts_and_comments(self):
+        """Находит записи и комментарии по словам без учёта регистра,
+        более релевантные результаты идут первыми."""
+        once = Post.objects.create(author=self.user, text='Кот спит.')
+        twice = Post.objects.create(author=self.user, text='Кот и кот.')
+        Post.objects.create(author=self.user, text='Собака.')
+        comment = Comment.objects.create(
+            author=self.user, post=once, text='Рыжий КОТ.',
+        )
+
+        results = self.search('кот').context['page'].results
+
+        self.assertEqual(
+            [(result.post, result.comment) for result in results][:1],
+            [(twice, None)],
+        )
+        self.assertCountEqual(
+            [(result.post, result.comment) for result in results],
+            [(twice, None), (once, None), (once, comment)],
+        )
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения выделяются, а текст записи экранируется."""
+        Post.objects.create(author=self.user, text='<b>Кот</b> спит.')
+
+        response = self.search('кот')
+
+        self.assertContains(response, '&lt;b&gt;<mark>Кот</mark>&lt;/b&gt;')
+
+    def test_index_follows_changes(self):
+        """Изменённые и удалённые записи находятся по новому тексту."""
+        post = Post.objects.create(author=self.user, text='Кот.')
+        deleted = Post.objects.create(author=self.user, text='Кот.')
+        post.text = 'Пёс.'
+        post.save()
+        deleted.delete()
+
+        self.assertEqual(self.search('кот').context['page'].results, [])
+        self.assertEqual(
+            self.search('пёс').context['page'].results[0].post, post
+        )
+
+    def test_keyset_pagination(self):
+        """Страницы результатов идут по курсору без пропусков и повторов."""
+        posts = Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кот номер {number}.')
+            for number in range(POSTS_PER_PAGE + 3)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        first = self.search('кот').context['page']
+        second = self.search('кот', after=first.next_cursor).context['page']
+
+        self.assertEqual(len(first.results), POSTS_PER_PAGE)
+        self.assertIsNone(second.next_cursor)
+        self.assertCountEqual(
+            [result.post.text for result in first.results + second.results],
+            [post.text for post in posts],
+        )
+
+    def test_query_syntax_is_not_passed_through(self):
+        """Спецсимволы в запросе не ломают поиск."""
+        Post.objects.create(author=self.user, text='Кот спит.')
+        for query in ('кот" OR (', 'NEAR(кот', '*', 'кот', '"'):
+            with self.subTest(query=query):
+                response = self.search(query, after='broken')
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит записи и комментарии по индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        self.client.force_login(admin)
+        posts = [
+            Post.objects.create(author=self.user, text='Кот спит.'),
+            Post.objects.create(author=self.user, text='Кот ест.'),
+        ]
+        Post.objects.create(author=self.user, text='Собака.')
+        comments = [
+            Comment.objects.create(
+                author=self.user, post=post, text='Рыжий кот.',
+            )
+            for post in posts
+        ]
+        Comment.objects.create(author=self.user, post=posts[0], text='Да.')
+
+        for url, expected in (
+            (reverse('admin:posts_post_changelist'), posts),
+            (reverse('admin:posts_comment_changelist'), comments),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'q': 'КОТ'})
+                self.assertCountEqual(
+                    response.context['cl'].result_list, expected,
+                )
+
+    def test_filter_returns_all_matches(self):
+        """Фильтр по индексу возвращает все совпадения, а не первое."""
+        posts = [
+            Post.objects.create(author=self.user, text=f'Кот {number}.')
+            for number in range(3)
+        ]
+        Post.objects.create(author=self.user, text='Собака.')
+        comments = [
+            Comment.objects.create(author=self.user, post=post, text='Кот.')
+            for post in posts[:2]
+        ]
+        backend = get_search_backend()
+
+        self.assertCountEqual(backend.filter(Post.objects.all(), 'кот'), posts)
+        self.assertCountEqual(
+            backend.filter(Comment.objects.all(), 'кот'), comments,
+        )
+
+    def test_other_databases_search_without_index(self):
+        """На базах, кроме SQLite, поиск работает без индекса,
+        а сохранение записей не падает."""
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        with mock.patch('posts.search.connection') as other_connection:
+            other_connection.vendor = 'postgresql'
+            backend = get_search_backend()
+            post = Post.objects.create(author=self.user, text='<b>Cat</b>.')
+            post.text = '<b>Cat</b> sleeps.'
+            post.save()
+            Post.objects.create(author=self.user, text='Dog.').delete()
+        self.assertIsInstance(backend, ContainsSearchBackend)
+        self.assertIsInstance(get_search_backend(), ContainsSearchBackend)
+
+        get_search_backend.cache_clear()
+        self.assertIsInstance(get_search_backend(), SQLiteSearchBackend)
+
+    def test_search_without_index(self):
+        """Поиск без индекса находит тексты со всеми словами запроса
+        и продолжает с позиции последнего результата."""
+        posts = [
+            Post.objects.create(author=self.user, text=f'Cat {number} <b>')
+            for number in range(3)
+        ]
+        Post.objects.create(author=self.user, text='Dog.')
+        comment = Comment.objects.create(
+            author=self.user, post=posts[0], text='Red CAT 0.',
+        )
+        backend = ContainsSearchBackend()
+
+        self.assertCountEqual(
+            backend.filter(Post.objects.all(), '"cat* ('), posts,
+        )
+        self.assertCountEqual(backend.filter(Post.objects.all(), '*'), [])
+        first = backend.search('cat 0', limit=1)
+        second = backend.search('cat 0', limit=2, after=first[0].position)
+        self.assertEqual(
+            [(hit.model, hit.pk) for hit in first + second],
+            [(Post, posts[0].pk), (Comment, comment.pk)],
+        )
+        self.assertEqual(first[0].snippet, 'Cat 0 &lt;b&gt;')
+
+
+@override_settings(
+    REQUEST_METRICS_SAMPLE_RATE=1.0,
+    REQUEST_METRICS_SERVER_TIMING=True,
+)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+        Post.objects.create(author=self.user, text='Текст.')
+
+    def get_with_log(self, url):
+        with self.assertLogs('yatube.metrics', 'INFO') as logs:
+            response = Client().get(url)
+        self.assertEqual(len(logs.records), 1)
+        return response, json.loads(logs.records[0].getMessage())
+
+    def test_metrics_are_recorded(self):
+        """Число запросов, время шаблонов и обращения к кэшу попадают
+        в заголовок Server-Timing и в журнал."""
+        with CaptureQueriesContext(connection) as queries:
+            response, record = self.get_with_log(_.INDEX_URL)
+        # Журнал запросов соединения очищается в начале каждого запроса.
+        cold_queries = len(queries)
+
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], cold_queries)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        header = response['Server-Timing']
+        self.assertIn(f'desc="{cold_queries} queries"', header)
+        self.assertIn('tpl;dur=', header)
+        self.assertIn('total;dur=', header)
+
+        _response, record = self.get_with_log(_.INDEX_URL)
+        self.assertGreater(record['cache_hits'], 0)
+        self.assertEqual(record['cache_misses'], 0)
+        self.assertLess(record['queries'], cold_queries)
+
+    def test_metrics_are_written_by_configured_logger(self):
+        """Настроенный в LOGGING журнал записывает строку метрик
+        каждого замеренного запроса."""
+        log_file = os.path.join(tempfile.mkdtemp(), 'metrics.log')
+        self.addCleanup(shutil.rmtree, os.path.dirname(log_file))
+        config = deepcopy(settings.LOGGING)
+        config['handlers']['metrics']['filename'] = log_file
+        logging.config.dictConfig(config)
+        self.addCleanup(logging.config.dictConfig, settings.LOGGING)
+
+        Client().get(_.INDEX_URL)
+
+        logging.getLogger('yatube.metrics').handlers[0].close()
+        with open(log_file, encoding='utf-8') as lines:
+            record = json.loads(lines.readline())
+        self.assertEqual(record['view'], 'posts:index')
+
+    def test_cached_none_is_a_hit(self):
+        """Сохранённое в кэше значение None считается попаданием."""
+        install()
+        cache.set_many({'key': None, 'other': 1})
+        with collect() as metrics:
+            self.assertIsNone(cache.get('key'))
+            self.assertEqual(cache.get('missing', 'default'), 'default')
+            cache.get_many(['other', 'missing'])
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 2))
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_can_be_disabled(self):
+        """Без REQUEST_METRICS_SERVER_TIMING метрики только пишутся
+        в журнал."""
+        response, _record = self.get_with_log(_.INDEX_URL)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_not_sampled_requests_are_not_recorded(self):
+        """Запросы вне выборки не замеряются."""
+        with override_settings(REQUEST_METRICS_SAMPLE_RATE=0.5), \
+                mock.patch('yatube.metrics.random.random', return_value=0.7):
+            response = Client().get(_.INDEX_URL)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_disabled_middleware_is_not_used(self):
+        """При нулевой доле выборки middleware отключается."""
+        response = Client().get(_.INDEX_URL)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_debug_toolbar_is_shown_only_to_internal_addresses(self):
+        """Панель отладки показывается только в режиме отладки
+        с внутренних адресов."""
+        request = RequestFactory().get(_.INDEX_URL)
+        for debug, address, expected in (
+            (True, '127.0.0.1', True),
+            (True, '203.0.113.1', False),
+            (False, '127.0.0.1', False),
+        ):
+            with self.subTest(debug=debug, address=address):
+                request.META['REMOTE_ADDR'] = address
+                with self.settings(DEBUG=debug):
+                    self.assertIs(show_toolbar(request), expected)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+    REPLICA_TEXT = 'Запись из реплики.'
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика — копия тестовой базы в отдельном файле SQLite.
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, 'replica.sqlite3')
+        connections['default'].ensure_connection()
+        replica = sqlite3.connect(path)
+        connections['default'].connection.backup(replica)
+        replica.close()
+        connections.databases['replica'] = {
+            **connections['default'].settings_dict, 'NAME': path,
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=_.TEST_USERNAME)
+        # Запись есть только в реплике: по ней видно, откуда шло чтение.
+        User.objects.using('replica').bulk_create([
+            User(pk=cls.user.pk, username=_.TEST_USERNAME,
+                 password=cls.user.password),
+        ])
+        UserStats.objects.using('replica').bulk_create([
+            UserStats(user_id=cls.user.pk, posts_count=1),
+        ])
+        Post.objects.using('replica').bulk_create([
+            Post(author_id=cls.user.pk, text=cls.REPLICA_TEXT),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_read_only_views_read_from_replica(self):
+        """Страницы только для чтения читают данные из реплики."""
+        for url in (_.INDEX_URL, _.USER_PROFILE_URL, _.FOLLOW_INDEX_URL):
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = Client().get(_.INDEX_URL)
+        self.assertContains(response, self.REPLICA_TEXT)
+
+    def test_writes_pin_client_to_primary(self):
+        """После записи клиент читает из основной базы."""
+        response = self.authorized_client.post(
+            _.NEW_POST_URL, {'text': 'Новая запись.'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response = self.authorized_client.get(_.INDEX_URL)
+        self.assertContains(response, 'Новая запись.')
+        self.assertNotContains(response, self.REPLICA_TEXT)
+
+        cache.clear()
+        response = Client().get(_.INDEX_URL)
+        self.assertContains(response, self.REPLICA_TEXT)
+        self.assertNotContains(response, 'Новая запись.')
+
+    def test_replica_renders_are_not_served_from_primary(self):
+        """Фрагменты и страницы, построенные по реплике, не отдаются
+        читающим из основной базы под той же версией лент."""
+        pinned_client = Client()
+        pinned_client.cookies[PIN_COOKIE] = '1'
+        for page_cache in (False, True):
+            with self.subTest(page_cache=page_cache), self.settings(
+                ANONYMOUS_PAGE_CACHE=page_cache,
+            ):
+                cache.clear()
+                self.assertContains(
+                    Client().get(_.INDEX_URL), self.REPLICA_TEXT,
+                )
+                self.assertNotContains(
+                    pinned_client.get(_.INDEX_URL), self.REPLICA_TEXT,
+                )
+
+    def test_router_keeps_some_reads_on_primary(self):
+        """Сессии и чтения внутри транзакций идут в основную базу,
+        реплики не мигрируются."""
+        router = ReplicaRouter()
+        middleware = ReplicaMiddleware(lambda request: HttpResponse())
+        view = replica_reads(lambda request: None)
+
+        def check_view_reads():
+            middleware.process_view(RequestFactory().get('/'), view, (), {})
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertIsNone(router.db_for_read(Session))
+            # Построенное по реплике кешируется отдельно и недолго.
+            key, timeout = replica_cache('key', None)
+            self.assertNotEqual(key, 'key')
+            self.assertEqual(timeout, settings.REPLICA_PIN_SECONDS)
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(Post))
+
+        # Выбранная реплика остаётся в скопированном контексте.
+        contextvars.copy_context().run(check_view_reads)
+        self.assertIsNone(router.db_for_read(Post))
+        self.assertEqual(replica_cache('key', None), ('key', None))
+        self.assertIs(router.allow_migrate('replica', 'posts'), False)
+
+
+class AsgiTests(SimpleTestCase):
+    def test_asgi_requests_run_concurrently(self):
+        """Запросы к ASGI-приложению обрабатываются в разных потоках
+        одновременно."""
+        barrier = threading.Barrier(2, timeout=5)
+        threads = []
+
+        def wsgi_application(environ, start_response):
+            threads.append(threading.get_ident())
+            barrier.wait()
+            start_response('200 OK', [])
+            return [b'']
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            pass
+
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'path': '/',
+            'query_string': b'',
+            'headers': [],
+        }
+
+        async def main():
+            application = ConcurrentWsgiToAsgi(wsgi_application)
+            await asyncio.gather(
+                application(scope, receive, send),
+                application(scope, receive, send),
+            )
+
+        asyncio.run(main())
+
+        self.assertEqual(len(set(threads)), 2)
+
+    def test_asgi_application(self):
+        """ASGI-приложение отдаёт страницы."""
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'path': reverse('about:author'),
+            'query_string': b'',
+            'headers': [(b'host', b'testserver')],
+        }
+        asyncio.run(asgi_application(scope, receive, send))
+
+        self.assertEqual(messages[0]['type'], 'http.response.start')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(messages[-1], {'type': 'http.response.body'})
+
+    def test_asgi_request_is_finished_in_worker_thread(self):
+        """ASGI-приложение обрабатывает запрос в потоке пула
+        и завершает его, закрывая ответ."""
+        threads = []
+
+        def on_finished(sender, **kwargs):
+            threads.append(threading.get_ident())
+
+        request_finished.connect(on_finished)
+        self.addCleanup(request_finished.disconnect, on_finished)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            pass
+
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'path': reverse('about:author'),
+            'query_string': b'',
+            'headers': [(b'host', b'testserver')],
+        }
+        asyncio.run(asgi_application(scope, receive, send))
+
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=True)
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username=_.TEST_USERNAME)
+        self.group = Group.objects.create(
+            title=_.TEST_GROUP_TITLE,
+            slug=_.TEST_GROUP_SLUG,
+        )
+        Post.objects.create(author=self.user, group=self.group, text='Текст.')
+
+    def test_pages_are_cached_for_anonymous_users(self):
+        """Повторный запрос страницы анонимом не обращается к базе."""
+        for url in (_.INDEX_URL, _.GROUP_POSTS_URL, _.USER_PROFILE_URL):
+            with self.subTest(url=url):
+                cold = self.guest_client.get(url)
+                # Для групп и профилей нужен только их id.
+                with self.assertNumQueries(0 if url == _.INDEX_URL else 1):
+                    warm = self.guest_client.get(url)
+                self.assertEqual(warm.content, cold.content)
+                self.assertEqual(warm['ETag'], cold['ETag'])
+                self.assertTrue(warm.has_header('Last-Modified'))
+                self.assertIn('no-cache', warm['Cache-Control'])
+
+    def test_pages_are_cached_by_page_number(self):
+        """Разные страницы ленты кэшируются отдельно."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}.')
+            for number in range(POSTS_PER_PAGE)
+        )
+        cache.clear()
+        first = self.guest_client.get(_.INDEX_URL)
+        second = self.guest_client.get(_.INDEX_URL, {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+
+    def test_conditional_requests_get_not_modified(self):
+        """Запрос с актуальными ETag или Last-Modified получает 304."""
+        response = self.guest_client.get(_.INDEX_URL)
+        for header, value in (
+            ('HTTP_IF_NONE_MATCH', response['ETag']),
+            ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified']),
+        ):
+            with self.subTest(header=header):
+                with self.assertNumQueries(0):
+                    not_modified = self.guest_client.get(
+                        _.INDEX_URL, **{header: value},
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+
+    def test_changes_invalidate_pages(self):
+        """Изменения постов, групп, подписок и пользователей
+        обновляют кэшированные страницы."""
+        follower = User.objects.create_user(username=_.SECOND_TEST_USERNAME)
+        changes = (
+            (_.INDEX_URL, lambda: Post.objects.create(
+                author=self.user, text='Новый пост.',
+            )),
+            (_.GROUP_POSTS_URL, lambda: Group.objects.filter(
+                pk=self.group.pk,
+            ).first().save()),
+            (_.USER_PROFILE_URL, lambda: Follow.objects.create(
+                user=follower, author=self.user,
+            )),
+            (_.USER_PROFILE_URL, lambda: User.objects.filter(
+                pk=self.user.pk,
+            ).first().save()),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with capture_on_commit_callbacks(execute=True):
+                    change()
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_renames_are_shown_in_all_feeds(self):
+        """Новые названия групп и имена пользователей появляются
+        на всех страницах с их постами."""
+        urls = (_.INDEX_URL, _.GROUP_POSTS_URL, _.USER_PROFILE_URL)
+        for url in urls:
+            self.guest_client.get(url)
+        with capture_on_commit_callbacks(execute=True):
+            self.group.title = 'Новое название'
+            self.group.save()
+            self.user.username = 'new_username'
+            self.user.save()
+        profile_url = reverse('posts:profile', args=[self.user.username])
+        for url in (_.INDEX_URL, profile_url):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), self.group.title,
+                )
+        for url in (_.INDEX_URL, _.GROUP_POSTS_URL):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), '@new_username',
+                )
+
+    def test_new_post_is_shown_to_anonymous_users(self):
+        """Новый пост сразу появляется на кэшированной странице."""
+        self.guest_client.get(_.INDEX_URL)
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.create(author=self.user, text='Новый пост.')
+        response = self.guest_client.get(_.INDEX_URL)
+        self.assertContains(response, 'Новый пост.')
+
+    def test_authorized_users_get_rendered_pages(self):
+        """Авторизованным пользователям страницы не отдаются из кэша."""
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        self.guest_client.get(_.INDEX_URL)
+        response = authorized_client.get(_.INDEX_URL)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIsNotNone(response.context)
+
+    def test_missing_pages_are_not_found(self):
+        """Несуществующие группы и профили по-прежнему дают 404."""
+        for url in (
+            reverse('posts:group', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def capture_on_commit_callbacks(using=DEFAULT_DB_ALIAS, execute=False):
+    """Collect ``on_commit`` callbacks registered in the block and run
+    them on exit if execute is True, as ``TestCase`` never commits.
+
+    A backport of ``TestCase.captureOnCommitCallbacks`` of Django 3.2.
+    """
+    callbacks = []
+    start_count = len(connections[using].run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        run_on_commit = connections[using].run_on_commit[start_count:]
+        callbacks[:] = [func for _sids, func in run_on_commit]
+        if execute:
+            for callback in callbacks:
+                callback()
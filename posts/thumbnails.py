@@ -0,0 +1,224 @@
+"""Post image thumbnails generated off the request path.
+
+Thumbnails are generated by a pool of worker processes when a post
+pointing at an image without them is saved, whether the image is a new
+upload or a stored one reused for identical content. Templates only
+look up already generated thumbnails and never decode images while
+rendering a page.
+
+Every image gets a variant per width in ``POST_IMAGE_WIDTHS``, both in
+its own format and in WebP, so that browsers pick the smallest one
+fitting the screen through ``srcset``.
+"""
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import List, NamedTuple, Optional
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .cache import bump_feed_versions
+from .models import Post
+from .signals import post_scopes
+
+logger = logging.getLogger(__name__)
+
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+# The variant used as ``src`` by browsers not supporting ``srcset``.
+POST_IMAGE_DEFAULT_WIDTH = 960
+POST_IMAGE_ASPECT_RATIO = 960 / 339
+# None keeps the format of the original image.
+POST_IMAGE_FORMATS = (None, 'WEBP')
+POST_THUMBNAIL_OPTIONS = {
+    'crop': 'center',
+    # Images smaller than a variant are not blown up, the variant
+    # stays smaller and its real width goes to ``srcset``.
+    'upscale': False,
+}
+# Rendered width of a post card in the Bootstrap container.
+POST_IMAGE_SIZES = (
+    '(min-width: 1200px) 1110px, (min-width: 992px) 930px, '
+    '(min-width: 768px) 690px, (min-width: 576px) 510px, 100vw'
+)
+
+_executor = None
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Thumbnail backend which can look up a thumbnail
+    without generating it."""
+
+    def get_cached_thumbnail(self, file_, geometry_string,
+                             **options) -> Optional[ImageFile]:
+        """Return a thumbnail if it has been generated, otherwise None."""
+        source = ImageFile(file_)
+        options = self.get_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def get_options(self, source: ImageFile, options: dict) -> dict:
+        """Return options completed with defaults
+        the same way ``get_thumbnail`` does."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+
+backend = CachedThumbnailBackend()
+
+
+class ResponsiveImage(NamedTuple):
+    src: str
+    srcset: str
+    webp_srcset: str
+    sizes: str = POST_IMAGE_SIZES
+
+
+def geometry(width: int) -> str:
+    return f'{width}x{round(width / POST_IMAGE_ASPECT_RATIO)}'
+
+
+def variant_options(format_: Optional[str]) -> dict:
+    if format_ is None:
+        return POST_THUMBNAIL_OPTIONS
+    return dict(POST_THUMBNAIL_OPTIONS, format=format_)
+
+
+def cached_thumbnail(image, width: int = POST_IMAGE_DEFAULT_WIDTH,
+                     format_: Optional[str] = None) -> Optional[ImageFile]:
+    """Return a generated variant of a post image, if any."""
+    if not image:
+        return None
+    return backend.get_cached_thumbnail(
+        image, geometry(width), **variant_options(format_)
+    )
+
+
+def build_srcset(thumbnails: List[Optional[ImageFile]]) -> str:
+    """Return a ``srcset`` of generated variants. Variants of a small
+    image may share a width, only the first of them is listed."""
+    candidates = {}
+    for thumbnail in thumbnails:
+        if thumbnail is not None:
+            candidates.setdefault(thumbnail.width, thumbnail.url)
+    return ', '.join(
+        f'{url} {width}w' for width, url in sorted(candidates.items())
+    )
+
+
+def responsive_image(image) -> Optional[ResponsiveImage]:
+    """Return sources of a post image variants,
+    or None if they have not been generated yet."""
+    src = cached_thumbnail(image)
+    if src is None:
+        return None
+    return ResponsiveImage(
+        src=src.url,
+        srcset=build_srcset([
+            src if width == POST_IMAGE_DEFAULT_WIDTH
+            else cached_thumbnail(image, width)
+            for width in POST_IMAGE_WIDTHS
+        ]),
+        webp_srcset=build_srcset([
+            cached_thumbnail(image, width, 'WEBP')
+            for width in POST_IMAGE_WIDTHS
+        ]),
+    )
+
+
+def generate_thumbnails(name: str) -> None:
+    """Generate all variants of an image stored under the name.
+
+    The default variant is generated last: templates treat
+    the image as ready once it exists.
+    """
+    source = ImageFile(name, Post.image.field.storage)
+    widths = sorted(
+        POST_IMAGE_WIDTHS, key=lambda width: width == POST_IMAGE_DEFAULT_WIDTH
+    )
+    for width in widths:
+        for format_ in reversed(POST_IMAGE_FORMATS):
+            backend.get_thumbnail(
+                source, geometry(width), **variant_options(format_)
+            )
+
+
+def init_worker() -> None:
+    django.setup()
+    # A forked worker must not reuse database connections
+    # of the parent process.
+    for connection in connections.all():
+        connection.close()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            initializer=init_worker,
+        )
+    return _executor
+
+
+def log_failure(future: Future) -> None:
+    if future.exception() is not None:
+        logger.error(
+            'Thumbnail generation failed', exc_info=future.exception()
+        )
+
+
+def invalidate_feeds(scopes: List[str], future: Future) -> None:
+    """Invalidate cached feeds showing the original image
+    once its thumbnails are generated."""
+    if future.exception() is None:
+        bump_feed_versions(*scopes)
+
+
+def schedule_thumbnails(image) -> None:
+    """Generate thumbnails of a post image in a worker process
+    once the current transaction is committed.
+
+    With ``THUMBNAIL_WORKERS = 0`` thumbnails are generated in
+    the current process instead. Feeds of the post are invalidated
+    when the thumbnails are ready, as their cached fragments still
+    show the original image.
+    """
+    if not image:
+        return
+    name = image.name
+    post = image.instance
+    scopes = post_scopes(post.author_id, post.group_id)
+
+    def submit():
+        if not settings.THUMBNAIL_WORKERS:
+            generate_thumbnails(name)
+            bump_feed_versions(*scopes)
+            return
+        future = get_executor().submit(generate_thumbnails, name)
+        future.add_done_callback(log_failure)
+        future.add_done_callback(partial(invalidate_feeds, scopes))
+
+    transaction.on_commit(submit)
+
+
+@receiver(post_save, sender=Post)
+def schedule_missing_thumbnails(sender, instance, raw, **kwargs):
+    if not raw and cached_thumbnail(instance.image) is None:
+        schedule_thumbnails(instance.image)
@@ -0,0 +1,197 @@
+"""Materialized follow feeds (fan-out on write).
+
+With ``FOLLOW_FEED_MODE = 'write'`` every new post is pushed into the
+timelines of its author's followers, and the follow feed is read from
+them instead of being computed from ``Follows`` on every request.
+
+Posts of authors with more than ``FANOUT_MAX_FOLLOWERS`` followers are
+not pushed: followers read them from the posts table at request time
+and merge them with their timeline (the hybrid mode). Timeline entries
+of such authors, pushed before they became popular, are skipped, so no
+post is shown twice. An author who drops back below the limit has the
+posts made in the meantime pushed to the followers.
+"""
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Q, QuerySet, Sum
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry, User, UserStats
+from .paginator import KeysetPaginator, MergedFeed
+
+FANOUT_BATCH_SIZE = 500
+
+
+def fanout_enabled() -> bool:
+    return settings.FOLLOW_FEED_MODE == 'write'
+
+
+def is_celebrity(author_id: int) -> bool:
+    """Return True if an author has too many followers to fan out."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def push_post(post: Post) -> None:
+    """Push a new post into the timelines of its author's followers.
+
+    Timelines are trimmed after every ``TIMELINE_TRIM_INTERVAL``-th
+    post of the author rather than after every post.
+    """
+    stats = UserStats.objects.filter(user_id=post.author_id).values_list(
+        'followers_count', 'posts_count',
+    ).first()
+    followers_count, posts_count = stats or (0, 0)
+    if followers_count > settings.FANOUT_MAX_FOLLOWERS:
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if posts_count % settings.TIMELINE_TRIM_INTERVAL == 0:
+        trim(followers)
+
+
+def latest_posts(author_id: int):
+    return Post.objects.filter(author_id=author_id).order_by(
+        *KeysetPaginator.ordering,
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Copy the latest posts of a newly followed author
+    into a follower's timeline."""
+    if is_celebrity(author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in latest_posts(author_id)),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def restore_author(author_id: int) -> None:
+    """Push the latest posts of an author who has just dropped to
+    ``FANOUT_MAX_FOLLOWERS`` followers into all the followers' timelines,
+    as posts made while the author had more were not pushed."""
+    if not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FANOUT_MAX_FOLLOWERS,
+    ).exists():
+        return
+    posts = list(latest_posts(author_id))
+    followers = Follow.objects.filter(
+        author_id=author_id,
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for user_id in followers.iterator() for pk, pub_date in posts),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(followers)
+
+
+def prune(user_id: int, author_id: int) -> None:
+    """Remove posts of an unfollowed author from a follower's timeline."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def trim(user_ids) -> None:
+    """Keep only ``TIMELINE_MAX_LENGTH`` newest entries in each of
+    the timelines of the users.
+
+    Only the timelines over the limit are trimmed, each with a delete
+    of the range past its last kept entry.
+    """
+    length = settings.TIMELINE_MAX_LENGTH
+    overflowing = TimelineEntry.objects.filter(
+        user_id__in=user_ids,
+    ).values('user_id').annotate(
+        entries=Count('pk'),
+    ).filter(entries__gt=length).values_list('user_id', flat=True)
+    for user_id in overflowing:
+        timeline = TimelineEntry.objects.filter(user_id=user_id)
+        pub_date, post_id = timeline.order_by(
+            '-pub_date', '-post_id',
+        ).values_list('pub_date', 'post_id')[length - 1]
+        timeline.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post_id__lt=post_id)
+        ).delete()
+
+
+def celebrities_followed_by(user: User):
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.FANOUT_MAX_FOLLOWERS,
+    ).values('author')
+
+
+class TimelineFeed(MergedFeed):
+    """Follow feed of a user, newest posts first.
+
+    The timeline and the posts of every followed celebrity are read
+    in the feed order from their indexes and merged.
+    """
+
+    def __init__(self, user: User):
+        self.user = user
+
+    @cached_property
+    def celebrities(self) -> List[int]:
+        return list(celebrities_followed_by(self.user).values_list(
+            'author', flat=True,
+        ))
+
+    def count(self) -> int:
+        return timeline_posts_count(self.user)
+
+    def sources(self) -> List[Tuple[QuerySet, str]]:
+        timeline = self.user.timeline.order_by('-pub_date', '-post_id')
+        if self.celebrities:
+            timeline = timeline.exclude(post__author_id__in=self.celebrities)
+        return [(timeline.values_list('pub_date', 'post_id'), 'post_id')]
+
+    def author_ids(self) -> List[int]:
+        return self.celebrities
+
+
+def timeline_posts(user: User) -> TimelineFeed:
+    """Return a user's follow feed read from the timeline."""
+    return TimelineFeed(user)
+
+
+def timeline_posts_count(user: User) -> int:
+    """Return number of posts in a user's follow feed.
+
+    Timelines are bounded, so counting the entries is cheap. Entries
+    of celebrities are counted with the rest of their posts.
+    """
+    celebrities = celebrities_followed_by(user)
+    celebrity_posts = UserStats.objects.filter(
+        user__in=celebrities,
+    ).aggregate(total=Sum('posts_count'))['total']
+    entries = user.timeline.exclude(post__author__in=celebrities).count()
+    return entries + (celebrity_posts or 0)
+
+
+def rebuild_timelines() -> None:
+    """Fill the timelines of all users from their subscriptions."""
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
@@ -0,0 +1,167 @@
+"""Streaming export and import of site data as NDJSON.
+
+Every line is a JSON object ``{"model": ..., "pk": ..., "fields": ...}``
+with fields keyed by their column attribute names. Models go in
+dependency order, so every row refers only to rows above it.
+
+Rows are read and written in batches, so memory use does not depend on
+the size of the data. Imported rows are inserted with ``bulk_create``
+bypassing signals, so denormalized data is rebuilt afterwards.
+"""
+import datetime as dt
+import json
+from contextlib import contextmanager
+from itertools import groupby, islice
+from typing import IO, Iterable, Iterator, List
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from . import timelines
+from .cache import bump_feed_versions, follows_scope
+from .counters import (rebuild_comments_counters, rebuild_follows_counters,
+                       rebuild_posts_counters)
+from .models import Comment, Follow, Group, Post, User
+from .search import get_backend as get_search_backend
+from .signals import post_scopes
+
+# Password hashes and permission flags go too, so users log in
+# and admins keep their rights after a transfer.
+USER_FIELDS = (
+    'username', 'password', 'first_name', 'last_name', 'email',
+    'is_active', 'is_staff', 'is_superuser', 'date_joined',
+)
+
+# Models in dependency order with the fields they are exported with.
+# Counters are not exported, they are recounted after an import.
+MODELS = {
+    'user': (User, USER_FIELDS),
+    'group': (Group, ('title', 'slug', 'description')),
+    'post': (Post, ('text', 'pub_date', 'author_id', 'group_id', 'image')),
+    'comment': (Comment, ('post_id', 'author_id', 'text', 'created')),
+    'follow': (Follow, ('user_id', 'author_id')),
+}
+
+
+class TransferEncoder(DjangoJSONEncoder):
+    """Write datetimes with microseconds. ``DjangoJSONEncoder`` cuts
+    them to milliseconds, changing dates and the order of feeds."""
+
+    def default(self, o):
+        if isinstance(o, dt.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_rows(stream: IO[str], batch_size: int) -> int:
+    """Write all exported rows to a text stream, return their number."""
+    count = 0
+    for label, (model, fields) in MODELS.items():
+        rows = model.objects.order_by('pk').values_list('pk', *fields)
+        for pk, *values in rows.iterator(chunk_size=batch_size):
+            record = {
+                'model': label,
+                'pk': pk,
+                'fields': dict(zip(fields, values)),
+            }
+            stream.write(json.dumps(
+                record, cls=TransferEncoder, ensure_ascii=False,
+            ) + '\n')
+            count += 1
+    return count
+
+
+def batches(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def preserved_dates(model):
+    """Keep dates of imported rows: ``auto_now_add`` fields
+    would overwrite them with the time of the import."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def build(model, record: dict):
+    """Return an unsaved object of a model from an exported record."""
+    fields = {
+        name: model._meta.get_field(name).to_python(value)
+        for name, value in record['fields'].items()
+    }
+    obj = model(pk=record['pk'], **fields)
+    if model is User and 'password' not in fields:
+        # Exports made before passwords were exported.
+        obj.password = make_password(None)
+    return obj
+
+
+def affected_scopes(model, objs: List) -> List[str]:
+    """Return feed cache scopes showing a batch of imported objects."""
+    if model is Follow:
+        return [follows_scope(follow.user_id) for follow in objs]
+    if model is Post:
+        owners = {(post.author_id, post.group_id) for post in objs}
+    elif model is Comment:
+        owners = Post.objects.filter(
+            pk__in={comment.post_id for comment in objs},
+        ).values_list('author_id', 'group_id').distinct()
+    else:
+        return []
+    return [scope for owner in owners for scope in post_scopes(*owner)]
+
+
+def import_rows(lines: Iterable[str], batch_size: int) -> int:
+    """Insert rows read from NDJSON lines, return their number.
+
+    Each batch is inserted in its own transaction.
+    """
+    records = (json.loads(line) for line in lines if line.strip())
+    count = 0
+    for label, group in groupby(records, key=lambda record: record['model']):
+        model = MODELS[label][0]
+        with preserved_dates(model):
+            for batch in batches(group, batch_size):
+                objs = [build(model, record) for record in batch]
+                with transaction.atomic():
+                    model.objects.bulk_create(objs)
+                bump_feed_versions(*affected_scopes(model, objs))
+                count += len(objs)
+    reset_sequences()
+    return count
+
+
+def reset_sequences() -> None:
+    """Move primary key sequences past the imported rows."""
+    models = [model for model, _fields in MODELS.values()]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived_data() -> None:
+    """Rebuild everything signals keep up to date on single saves."""
+    with transaction.atomic():
+        rebuild_posts_counters()
+        rebuild_comments_counters()
+        rebuild_follows_counters()
+        get_search_backend().rebuild()
+        if timelines.fanout_enabled():
+            timelines.rebuild_timelines()
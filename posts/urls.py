@@ -30,6 +30,11 @@ urlpatterns = [
         views.follow_index,
         name='follow_index'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'group/<slug:slug>/',
         views.group_posts,
@@ -1,44 +1,89 @@
+from typing import List, Optional
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from yatube.replicas import replica_reads
 from yatube.settings import POSTS_PER_PAGE
 
-from .decorators import author_access, check_author_username
+from .cache import (ALL_POSTS, author_scope, feed_version, follows_scope,
+                    group_scope)
+from .counters import total_posts_count, user_stats
+from .decorators import cache_anonymous_page, resolve_post
+from .follows import FollowedFeed, is_following
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginator import MergedFeedPaginator, paginate
+from .search import search as search_posts
+from .timelines import fanout_enabled, timeline_posts
+
+
+def index_scopes() -> List[str]:
+    return [ALL_POSTS]
+
+
+def group_scopes(slug: str) -> Optional[List[str]]:
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True,
+    ).first()
+    return None if group_id is None else [group_scope(group_id)]
+
 
+def profile_scopes(username: str) -> Optional[List[str]]:
+    user_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True,
+    ).first()
+    return None if user_id is None else [author_scope(user_id)]
 
+
+@replica_reads
+@cache_anonymous_page(index_scopes)
 def index(request: HttpRequest) -> HttpResponse:
     """Return all posts ordered by date of publication."""
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = Post.objects.for_feed()
+    page = paginate(
+        request, posts, POSTS_PER_PAGE, count=total_posts_count()
+    )
 
     context = {
         'page': page,
+        'feed_version': feed_version(ALL_POSTS),
     }
     return render(request, 'index.html', context)
 
 
+@replica_reads
+@cache_anonymous_page(group_scopes)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """Return all posts of a group specified by a slug."""
     group = get_object_or_404(Group, slug=slug)
 
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page = paginate(request, posts, POSTS_PER_PAGE, count=group.posts_count)
 
     context = {
         'page': page,
         'group': group,
+        'feed_version': feed_version(group_scope(group.pk)),
     }
     return render(request, 'group.html', context)
 
 
+def search(request: HttpRequest) -> HttpResponse:
+    """Return posts and comments matching a query, most relevant first."""
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        page = search_posts(query, POSTS_PER_PAGE, request.GET.get('after'))
+
+    context = {
+        'query': query,
+        'page': page,
+    }
+    return render(request, 'search.html', context)
+
+
 @login_required
 def new_post(request: HttpRequest) -> HttpResponse:
     """Create new post if user is authenticated and valid data passed.
@@ -56,39 +101,50 @@ def new_post(request: HttpRequest) -> HttpResponse:
     return render(request, 'posts/new_post.html', context)
 
 
+@replica_reads
+@cache_anonymous_page(profile_scopes)
 def profile(request, username):
     """Cтраница профиля пользователя."""
-    user = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=user)
+    user = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    posts = Post.objects.for_feed().filter(author=user)
 
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(
+        request, posts, POSTS_PER_PAGE, count=user_stats(user).posts_count
+    )
 
     context = {
         'person': user,
         'page': page,
+        'is_following': is_following(request.user, user),
+        'feed_version': feed_version(author_scope(user.pk)),
     }
     return render(request, 'posts/profile.html', context)
 
 
-@check_author_username
+@replica_reads
+@resolve_post()
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = request.post
+    # The profile card shows the counters of the author.
+    user_stats(post.author)
     form = CommentForm(request.POST or None)
 
     context = {
         'form': form,
         'post': post,
+        'comments': post.comments.select_related('author'),
+        'is_following': is_following(request.user, post.author),
     }
     return render(request, 'posts/post.html', context)
 
 
-@check_author_username
 @login_required
-@author_access
+@resolve_post(author_only=True)
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = request.post
 
     form = PostForm(
         request.POST or None,
@@ -101,33 +157,43 @@ def post_edit(request, username, post_id):
 
     context = {
         'form': form,
+        'post': post,
     }
     return render(request, 'posts/new_post.html', context)
 
 
-@check_author_username
 @login_required
+@resolve_post()
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
 
     if form.is_valid():
         form.instance.author = request.user
-        form.instance.post = post
+        form.instance.post = request.post
         form.save()
     return redirect('posts:post', username=username, post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    authors = request.user.follower.authors()
-    posts = Post.objects.filter(author__in=authors)
-
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    if fanout_enabled():
+        posts = timeline_posts(request.user)
+    else:
+        posts = FollowedFeed(request.user)
+
+    page = paginate(
+        request, posts, POSTS_PER_PAGE, count=posts.count(),
+        paginator_class=MergedFeedPaginator,
+    )
 
-    return render(request, 'follow.html', {'page': page})
+    context = {
+        'page': page,
+        'feed_version': feed_version(
+            ALL_POSTS, follows_scope(request.user.pk)
+        ),
+    }
+    return render(request, 'follow.html', context)
 
 
 @login_required
@@ -0,0 +1,46 @@
+"""ASGI entry point.
+
+Django 2.2 handles requests synchronously, so the WSGI application is
+served through the asgiref adapter. ``asgiref.wsgi.WsgiToAsgi`` runs
+every request in one thread shared by the process; here each request
+runs in a thread of its own, the way Django's own ASGI handler does it
+since Django 4.0.
+"""
+import os
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+
+class ConcurrentWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        responses = []
+
+        def wsgi_application(environ, start_response):
+            response = self.wsgi_application(environ, start_response)
+            responses.append(response)
+            return response
+
+        # Thread-sensitive calls of the adapter run in a thread of the
+        # context, which is stopped when it exits.
+        async with ThreadSensitiveContext():
+            try:
+                await WsgiToAsgi(wsgi_application)(scope, receive, send)
+            finally:
+                await sync_to_async(finish)(responses)
+
+
+def finish(responses) -> None:
+    # Closing the response fires request_finished. Persistent
+    # connections would outlive the thread, so all of them are closed.
+    for response in responses:
+        if hasattr(response, 'close'):
+            response.close()
+    connections.close_all()
+
+
+application = ConcurrentWsgiToAsgi(get_wsgi_application())
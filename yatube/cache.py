@@ -0,0 +1,95 @@
+"""Cache helpers safe against cache stampedes.
+
+``get_or_rebuild`` stores values together with the time they stay
+fresh until. When a value goes stale, the first caller takes a lock
+and rebuilds it while the others keep serving the stale value
+(stale-while-revalidate). When there is no value at all, only the lock
+holder rebuilds it and the others wait for the result (single flight).
+"""
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from django.core.cache import BaseCache, cache as default_cache
+
+LOCK_KEY = '{key}:lock'
+LOCK_TIMEOUT = 30
+STALE_TIMEOUT = 60
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.05
+
+
+def get_or_rebuild(key: str, rebuild: Callable[[], Any],
+                   timeout: Optional[int],
+                   cache: BaseCache = default_cache,
+                   stale_timeout: int = STALE_TIMEOUT) -> Any:
+    """Return a cached value, rebuilding it at most once at a time.
+
+    key -- a cache key.
+    rebuild -- a callable returning a fresh value.
+    timeout -- seconds the value stays fresh, None for ever.
+    stale_timeout -- seconds a stale value may be served
+    while it is being rebuilt.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until is None or time.time() < fresh_until:
+            return value
+        token = _lock(cache, key)
+        if token is None:
+            return value
+        try:
+            return _rebuild(cache, key, rebuild, timeout, stale_timeout)
+        finally:
+            _unlock(cache, key, token)
+
+    deadline = time.time() + WAIT_TIMEOUT
+    token = _lock(cache, key)
+    while token is None:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if time.time() > deadline:
+            # The lock holder takes too long, do not keep the request
+            # waiting any more.
+            return rebuild()
+        token = _lock(cache, key)
+    try:
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        return _rebuild(cache, key, rebuild, timeout, stale_timeout)
+    finally:
+        _unlock(cache, key, token)
+
+
+def _rebuild(cache: BaseCache, key: str, rebuild: Callable[[], Any],
+             timeout: Optional[int], stale_timeout: int) -> Any:
+    value = rebuild()
+    if timeout is None:
+        cache.set(key, (value, None), None)
+    else:
+        cache.set(
+            key, (value, time.time() + timeout), timeout + stale_timeout
+        )
+    return value
+
+
+def _lock(cache: BaseCache, key: str) -> Optional[str]:
+    """Take the lock of a key, return a token of its owner
+    or None if the lock is held by someone else."""
+    token = uuid.uuid4().hex
+    if cache.add(LOCK_KEY.format(key=key), token, LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _unlock(cache: BaseCache, key: str, token: str) -> None:
+    """Release the lock of a key unless it has expired and been
+    taken by someone else during a rebuild longer than
+    ``LOCK_TIMEOUT``."""
+    lock_key = LOCK_KEY.format(key=key)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
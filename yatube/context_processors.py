@@ -1,6 +1,7 @@
 import datetime as dt
 from typing import Dict
 
+from django.conf import settings
 from django.http import HttpRequest
 
 
@@ -10,3 +11,10 @@ def year(request: HttpRequest) -> Dict[str, int]:
     return {
         'year': calculated_year,
     }
+
+
+def feed_cache_timeout(request: HttpRequest) -> Dict[str, int]:
+    """Return timeout of cached feed fragments."""
+    return {
+        'FEED_CACHE_TIMEOUT': settings.FEED_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,209 @@
+"""Lightweight per-request metrics for production.
+
+``RequestMetricsMiddleware`` records, for a sampled share of requests,
+the number of queries, the time spent in the database, in rendering
+templates and the number of cache hits and misses. They are logged by
+the ``yatube.metrics`` logger as one JSON line per request and, if
+``REQUEST_METRICS_SERVER_TIMING`` is set, sent in the ``Server-Timing``
+header.
+
+With ``REQUEST_METRICS_SAMPLE_RATE = 0`` the middleware removes itself
+from the stack, and queries, template and cache calls are never wrapped.
+
+Metrics are kept in a context variable, which the ASGI adapter copies
+into the thread running the request.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+_metrics = ContextVar('request_metrics', default=None)
+_installed = False
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'template_time', 'template_depth',
+                 'cache_hits', 'cache_misses', 'lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.lock = threading.Lock()
+
+    def add(self, **values) -> None:
+        """Add values to counters, safe to call from several threads."""
+        with self.lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _metrics.get()
+
+
+def count_query(execute, sql, params, many, context):
+    metrics = current_metrics()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add(queries=1, db_time=time.perf_counter() - started)
+
+
+def wrap_connection(connection, **kwargs) -> None:
+    # Inserted first, as execute_wrapper() blocks pop the last wrapper.
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+@contextmanager
+def collect() -> Iterator[RequestMetrics]:
+    """Collect metrics for the duration of the block."""
+    metrics = RequestMetrics()
+    token = _metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+def timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        metrics = current_metrics()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        # Templates rendered from other templates are already timed.
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+    return wrapper
+
+
+def counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, MISSING, version)
+        metrics = current_metrics()
+        if metrics is not None:
+            if value is MISSING:
+                metrics.add(cache_misses=1)
+            else:
+                metrics.add(cache_hits=1)
+        return default if value is MISSING else value
+    return wrapper
+
+
+def counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        # The default implementation calls get() for every key.
+        token = _metrics.set(None)
+        try:
+            values = get_many(self, keys, version)
+        finally:
+            _metrics.reset(token)
+        metrics.add(
+            cache_hits=len(values), cache_misses=len(keys) - len(values),
+        )
+        return values
+    return wrapper
+
+
+def install() -> None:
+    """Wrap queries, template rendering and the cache backends in use.
+
+    Wrappers only do work while metrics are being collected.
+    """
+    global _installed
+    if _installed:
+        return
+    connection_created.connect(wrap_connection)
+    for connection in connections.all():
+        wrap_connection(connection)
+    Template.render = timed_render(Template.render)
+    backends = {type(caches[alias]) for alias in settings.CACHES}
+    for backend in backends:
+        backend.get = counted_get(backend.get)
+        backend.get_many = counted_get_many(backend.get_many)
+    _installed = True
+
+
+def server_timing(metrics: RequestMetrics, total: float) -> str:
+    return ', '.join((
+        f'db;dur={metrics.db_time * 1000:.1f};'
+        f'desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+        f'cache;desc="{metrics.cache_hits} hits, '
+        f'{metrics.cache_misses} misses"',
+        f'total;dur={total * 1000:.1f}',
+    ))
+
+
+class RequestMetricsMiddleware:
+    """Record metrics of every ``REQUEST_METRICS_SAMPLE_RATE``-th share
+    of requests. Should go first in ``MIDDLEWARE``."""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect() as metrics:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(metrics, total)
+        resolver_match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'view': resolver_match.view_name if resolver_match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'template_ms': round(metrics.template_time * 1000, 1),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }))
+        return response
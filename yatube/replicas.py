@@ -0,0 +1,124 @@
+"""Reading from database replicas.
+
+Views decorated with ``replica_reads`` make their reads from a random
+one of ``DATABASE_REPLICAS`` when requested with a safe method. Any
+write made during a request pins the client to the primary database
+for ``REPLICA_PIN_SECONDS`` with a cookie, so users read their own
+writes while replicas catch up. Sessions are always read from the
+primary, as a lagging replica would log the user out.
+
+Replicas are kept up to date by the database, not by Django: they are
+never migrated.
+
+The replica is kept in a context variable, which the ASGI adapter
+copies into the thread running the request.
+
+Fragments and pages rendered from a replica are cached apart from
+the ones rendered from the primary and only for
+``REPLICA_PIN_SECONDS``: a lagging replica may not have the changes
+which have already bumped the versions in their cache keys.
+"""
+import random
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_ONLY_APPS = ('sessions',)
+REPLICA_CACHE_KEY = '{key}:replica'
+
+# The replica picked for the current view and the number of atomic
+# blocks open when the view started.
+_replica = ContextVar('replica', default=(None, 0))
+_wrote = ContextVar('wrote', default=False)
+
+
+def replica_reads(view_func):
+    """Mark a view as one that may read from a replica."""
+    view_func.replica_reads = True
+    return view_func
+
+
+def current_replica():
+    return _replica.get()[0]
+
+
+def replica_cache(key: str,
+                  timeout: Optional[int]) -> Tuple[str, Optional[int]]:
+    """Return the cache key and timeout of a value rendered
+    by the current view."""
+    if current_replica() is None:
+        return key, timeout
+    pin_seconds = settings.REPLICA_PIN_SECONDS
+    if timeout is not None:
+        pin_seconds = min(timeout, pin_seconds)
+    return REPLICA_CACHE_KEY.format(key=key), pin_seconds
+
+
+def atomic_depth() -> int:
+    """Return the number of atomic blocks open on the primary."""
+    connection = connections[DEFAULT_DB_ALIAS]
+    return connection.in_atomic_block + len(connection.savepoint_ids)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica, view_atomic_depth = _replica.get()
+        if (replica is None
+                or model._meta.app_label in PRIMARY_ONLY_APPS
+                # Reads of a transaction opened by the view have to see
+                # its writes.
+                or atomic_depth() > view_atomic_depth):
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrote_token = _wrote.set(False)
+        replica_token = _replica.set((None, 0))
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _replica.reset(replica_token)
+            _wrote.reset(wrote_token)
+        if wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (getattr(view_func, 'replica_reads', False)
+                and request.method in SAFE_METHODS
+                and PIN_COOKIE not in request.COOKIES):
+            _replica.set(
+                (random.choice(settings.DATABASE_REPLICAS), atomic_depth())
+            )
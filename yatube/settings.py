@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -29,7 +30,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,20 +57,55 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'yatube.context_processors.year',
+                'yatube.context_processors.feed_cache_timeout',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Served with an ASGI server, e.g. uvicorn yatube.asgi:application.
+ASGI_APPLICATION = 'yatube.asgi.application'
 
+# SQLite tuned for concurrent requests: in WAL mode readers do not wait
+# for a writer, write transactions take the lock when they begin and
+# wait for each other up to timeout seconds, connections are reused
+# for CONN_MAX_AGE seconds. See yatube/sqlite3/base.py.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                # Durable on application crashes, may lose the latest
+                # transactions on a power loss.
+                'synchronous': 'NORMAL',
+                'mmap_size': 256 * 1024 * 1024,
+                # Negative sizes are in KiB.
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
     }
 }
 
+# Aliases of DATABASES read-only views read from, see yatube/replicas.py.
+# A local replica is a copy of the database file, e.g.
+#     'replica': {
+#         **DATABASES['default'],
+#         'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+#         'TEST': {'MIRROR': 'default'},
+#     }
+# refreshed with: sqlite3 db.sqlite3 ".backup replica.sqlite3"
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+# Seconds a client that has written reads from the primary database.
+REPLICA_PIN_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -83,11 +121,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Feed versions, cached fragments and pages and rebuild locks have to be
+# shared by every process serving the site and running management
+# commands: a change made in one of them must invalidate feeds in all.
+# CACHE_LOCATION holds memcached addresses separated by semicolons.
+# Without it the cache is local to the process, which only suits tests
+# and a single runserver process, and `check --deploy` warns about it.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION.split(';'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
 LANGUAGE_CODE = 'ru-RU'
 
@@ -112,6 +165,88 @@ LOGOUT_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary
+# file in chunks, uploads over UPLOAD_MAX_BYTES are discarded.
+FILE_UPLOAD_HANDLERS = [
+    'yatube.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 1024 * 1024
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+# Images over IMAGE_MAX_PIXELS are rejected before being decoded,
+# images with a side over IMAGE_MAX_SIDE are downscaled on upload.
+IMAGE_MAX_PIXELS = 25 * 1000 * 1000
+IMAGE_MAX_SIDE = 2560
+
 POSTS_PER_PAGE = 10
 
-# INTERNAL_IPS = ('127.0.0.1',)
+# Worker processes generating post thumbnails, 0 to generate them inline.
+THUMBNAIL_WORKERS = 2
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+# Changes invalidate cached feeds at once only in a shared cache,
+# a process-local one is left to expire them.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24 if CACHE_LOCATION else 60
+# Cache whole feed pages for anonymous users and answer conditional
+# requests for them, only safe with a shared cache.
+ANONYMOUS_PAGE_CACHE = bool(CACHE_LOCATION)
+FOLLOWED_AUTHORS_CACHE_LIMIT = 1000
+FOLLOWED_AUTHORS_CACHE_TIMEOUT = 60 * 60
+
+# Backend of the full-text search index of posts and comments.
+SEARCH_BACKEND = 'posts.search.SQLiteSearchBackend'
+
+# 'read' builds the follow feed from subscriptions on every request,
+# 'write' pushes new posts into materialized follower timelines.
+FOLLOW_FEED_MODE = 'read'
+TIMELINE_MAX_LENGTH = 1000
+# Timelines of an author's followers are trimmed to TIMELINE_MAX_LENGTH
+# after every TIMELINE_TRIM_INTERVAL-th post of the author, so they may
+# run over the limit by up to as many entries per followed author.
+TIMELINE_TRIM_INTERVAL = 10
+FANOUT_MAX_FOLLOWERS = 10000
+
+# Share of requests to record query, template and cache metrics of,
+# 0 disables the metrics middleware.
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 0)
+)
+# Send recorded metrics to clients in the Server-Timing header.
+REQUEST_METRICS_SERVER_TIMING = DEBUG
+# Recorded metrics are logged as one JSON line per request.
+REQUEST_METRICS_LOG_FILE = os.environ.get(
+    'REQUEST_METRICS_LOG_FILE',
+    os.path.join(tempfile.gettempdir(), 'yatube-metrics.log'),
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {
+            'format': '{message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'metrics': {
+            # Reopens the file after it is rotated, e.g. by logrotate.
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': REQUEST_METRICS_LOG_FILE,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['metrics'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+INTERNAL_IPS = ('127.0.0.1',)
+DEBUG_TOOLBAR_CONFIG = {
+    'SHOW_TOOLBAR_CALLBACK': 'yatube.utils.show_toolbar',
+}
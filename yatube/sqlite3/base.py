@@ -0,0 +1,42 @@
+"""SQLite backend applying pragmas and a transaction mode on connect.
+
+Two options are read from ``OPTIONS`` on top of the arguments of
+``sqlite3.connect()``:
+
+``pragmas`` -- a dict of pragmas set on every new connection, e.g.
+``{'journal_mode': 'WAL', 'synchronous': 'NORMAL'}``.
+
+``transaction_mode`` -- ``'DEFERRED'`` (the default), ``'IMMEDIATE'``
+or ``'EXCLUSIVE'``, the kind of ``BEGIN`` starting atomic blocks.
+A deferred transaction that reads before it writes fails at once with
+"database is locked" if another connection is writing, as waiting
+could deadlock. An immediate one takes the write lock when it begins,
+so it waits for other writers up to the ``timeout`` option instead.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', 'DEFERRED')
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'Unknown SQLite transaction mode '
+                f'{self.transaction_mode!r}, use one of '
+                f'{", ".join(TRANSACTION_MODES)}.'
+            )
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
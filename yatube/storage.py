@@ -0,0 +1,50 @@
+"""File storage keeping a single copy of identical files."""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content) -> str:
+    """Return the SHA-256 hex digest of a file read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after a hash of their content.
+
+    A file is stored as ``<directory>/ab/cd/abcd...<ext>``, where the
+    directory comes from ``upload_to``. Saving content which is already
+    stored writes nothing and returns the name of the stored file, so
+    identical uploads share their bytes. Deleting a shared file is up to
+    its users, see ``posts.images.release_image``.
+
+    As a file found stored may be deleted before the object saved with
+    it is committed, users write it again with ``restore`` afterwards.
+    """
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        digest = content_hash(content)
+        name = os.path.join(
+            directory,
+            digest[:2],
+            digest[2:4],
+            digest + os.path.splitext(filename)[1].lower(),
+        )
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def restore(self, name, content) -> None:
+        """Write content under the name of its stored file,
+        if the file has been deleted."""
+        if not self.exists(name):
+            content.seek(0)
+            super()._save(name, content)
@@ -0,0 +1,38 @@
+"""Upload handlers keeping memory and disk usage of uploads bounded."""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Stop keeping a file once it grows over ``UPLOAD_MAX_BYTES``.
+
+    The handler must go first in ``FILE_UPLOAD_HANDLERS``. Chunks past
+    the limit are not handed to the following handlers, so they are
+    neither buffered in memory nor written to disk. The file is replaced
+    with an empty one reporting the received size, for forms to reject.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= settings.UPLOAD_MAX_BYTES:
+            return None
+        return UploadedFile(
+            file=BytesIO(),
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.received,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
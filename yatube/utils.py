@@ -1,5 +1,7 @@
 from textwrap import fill, shorten
 
+from django.conf import settings
+
 
 def wrap_text(text: str) -> str:
     """Return beautifully wrapped text."""
@@ -7,5 +9,9 @@ def wrap_text(text: str) -> str:
     return fill(text, width=70)
 
 
-def show_toolbar(request):
-    return True
+def show_toolbar(request) -> bool:
+    """Show the debug toolbar only in debug mode to internal addresses."""
+    return (
+        settings.DEBUG
+        and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    )